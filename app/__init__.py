@@ -1,7 +1,12 @@
-from flask import Flask
+from flask import Flask, jsonify
 from config import Config
 import logging
 from app.middlewares.auth_middleware import authenticate
+from app.utils import db, invalidation, uploads, thumbnails
+from app.utils.db import PoolTimeoutError
+from app.utils.pagination import PaginationError
+from app.utils.password_utils import HashPoolSaturated
+from app.services.export_service import ExportBusy
 
 def create_app():
     app = Flask(__name__)
@@ -11,15 +16,53 @@ def create_app():
     logging.basicConfig(level=app.config['LOG_LEVEL'], format=app.config['LOG_FORMAT'])
     app.logger = logging.getLogger(__name__)
 
+    # Satu koneksi/transaksi database per request
+    db.init_app(app)
+
+    # Listener invalidasi cache antar worker (PostgreSQL LISTEN/NOTIFY)
+    invalidation.init_app(app)
+
+    # Upload ditulis langsung ke file sementara lalu diproses di background
+    uploads.init_app(app)
+    thumbnails.init_app(app)
+
     # Daftarkan middleware untuk menjalankan sebelum setiap request
     app.before_request(authenticate)
 
+    # Pool koneksi penuh: balas cepat dengan 503 daripada menggantung request
+    @app.errorhandler(PoolTimeoutError)
+    def handle_pool_timeout(e):
+        app.logger.warning(str(e))
+        return jsonify({'error': 'Server sedang sibuk, coba lagi nanti'}), 503
+
+    # Lonjakan login/registrasi: tolak cepat agar endpoint lain tidak ikut tertahan
+    @app.errorhandler(HashPoolSaturated)
+    def handle_hash_pool_saturated(e):
+        app.logger.warning(str(e))
+        return jsonify({'error': 'Server sedang sibuk, coba lagi nanti'}), 503
+
+    # Export berjalan dengan koneksi database sendiri, jadi jumlahnya dibatasi
+    @app.errorhandler(ExportBusy)
+    def handle_export_busy(e):
+        app.logger.warning(str(e))
+        return jsonify({'error': 'Server sedang sibuk, coba lagi nanti'}), 503
+
+    @app.errorhandler(PaginationError)
+    def handle_pagination_error(e):
+        return jsonify({'error': str(e)}), 400
+
     from .routes.user_routes import user_bp
     from .routes.umkm_routes import umkm_bp
     from .routes.produk_routes import produk_bp
+    from .routes.upload_routes import upload_bp
+    from .routes.search_routes import search_bp
+    from .routes.export_routes import export_bp
 
     app.register_blueprint(user_bp)
     app.register_blueprint(umkm_bp)
     app.register_blueprint(produk_bp)
+    app.register_blueprint(upload_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(export_bp)
 
     return app
\ No newline at end of file
@@ -1,2 +1,3 @@
-from .auth_middleware import authenticate, admin_required, user_required, user_or_admin_required, admin_or_owner_required
-from .umkm_middleware import umkm_action_allowed, umkm_suspended_check, umkm_nonaktif_allowed
\ No newline at end of file
+from .auth_middleware import authenticate, admin_required, user_required, user_or_admin_required, admin_or_owner_required, invalidate_user_suspension
+from .umkm_middleware import umkm_policy, resolve_umkm, admin_bypass, owner_only, suspended_denied, inactive_denied, inactive_non_owner_denied, umkm_nonaktif_allowed
+from .produk_middleware import produk_policy, produk_owner_only, produk_owner_required
@@ -1,9 +1,37 @@
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app
 import jwt
 from functools import wraps
-from app.utils.db import get_db_connection
+from app.utils.db import get_db
+from app.utils.cache import TTLCache, MISSING
+from app.utils.metrics import register_metrics
+from app.utils.invalidation import register_invalidation_handler
+from app.utils.jwt_utils import decode_token_cached
 from config import Config
 
+# Cache status suspend per user id, agar tidak ada query ke database di setiap request
+suspension_cache = TTLCache(maxsize=Config.SUSPENSION_CACHE_SIZE, ttl=Config.SUSPENSION_CACHE_TTL)
+register_metrics('suspension_cache', suspension_cache.stats)
+
+def is_user_suspended(user_id):
+    suspended = suspension_cache.get(user_id)
+    if suspended is MISSING:
+        generation = suspension_cache.generation()
+        cur = get_db().cursor()
+        cur.execute('SELECT suspended FROM "user" WHERE id = %s;', (user_id,))
+        user = cur.fetchone()
+        cur.close()
+        suspended = bool(user and user[0])
+        suspension_cache.set(user_id, suspended, generation=generation)
+    return suspended
+
+def invalidate_user_suspension(user_id):
+    if user_id is None:
+        suspension_cache.clear()
+    else:
+        suspension_cache.invalidate(int(user_id))
+
+register_invalidation_handler('user', invalidate_user_suspension)
+
 # Function Authorization
 def authenticate():
     exempt_routes = ['/auth']
@@ -12,19 +40,12 @@ def authenticate():
         if token and token.startswith("Bearer "):
             token = token[7:]
             try:
-                decoded_token = jwt.decode(token, Config.SECRET_KEY, algorithms=['HS256'])
+                decoded_token = decode_token_cached(token, Config.SECRET_KEY)
                 if 'role' in decoded_token and 'id' in decoded_token:
                     g.user = decoded_token
 
                     # Cek apakah user disuspend
-                    conn = get_db_connection()
-                    cur = conn.cursor()
-                    cur.execute('SELECT suspended FROM "user" WHERE id = %s;', (g.user['id'],))
-                    user = cur.fetchone()
-                    cur.close()
-                    conn.close()
-
-                    if user and user[0]:  # Jika user disuspend
+                    if is_user_suspended(g.user['id']):  # Jika user disuspend
                         return jsonify({'error': 'Akun Anda disuspend'}), 403
                 else:
                     return jsonify({'error': 'Token tidak valid, atribut hilang'}), 401
@@ -54,10 +75,10 @@ def user_or_admin_required(f):
     def decorator(*args, **kwargs):
         try:
             if not hasattr(g, 'user') or g.user.get('role') not in ['USER', 'ADMIN']:
-                print(f"g.user: {g.user}") #debugging
+                current_app.logger.debug(f"g.user: {g.user}")
                 return jsonify({'error': 'User or Admin only'}), 403
         except AttributeError as e:
-            print(f"AttributeError: {e}") #debugging
+            current_app.logger.debug(f"AttributeError: {e}")
             return jsonify({'error': 'Hak akses tidak ada, user tidak valid'}), 403
         return f(*args, **kwargs)
     return decorator
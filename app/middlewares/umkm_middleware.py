@@ -1,69 +1,127 @@
 from flask import jsonify, g, request
 from functools import wraps
-from app.utils.db import get_db_connection
+from app.utils.db import get_db
+from app.utils.cache import TTLCache, MISSING
+from app.utils.metrics import register_metrics
+from app.utils.invalidation import register_invalidation_handler
 from psycopg2.extras import RealDictCursor
+from config import Config
+
+# Cache pemilik dan status UMKM yang dipakai middleware UMKM dan produk
+umkm_status_cache = TTLCache(maxsize=Config.UMKM_STATUS_CACHE_SIZE, ttl=Config.UMKM_STATUS_CACHE_TTL)
+register_metrics('umkm_status_cache', umkm_status_cache.stats)
+
+def get_umkm_status(umkm_id):
+    umkm = umkm_status_cache.get(umkm_id)
+    if umkm is MISSING:
+        generation = umkm_status_cache.generation()
+        with get_db().cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT id_user, status_umkm FROM umkm WHERE id = %s;', (umkm_id,))
+            umkm = cur.fetchone()
+        # UMKM yang tidak ditemukan tidak di-cache, karena id tersebut bisa segera dipakai UMKM baru
+        if umkm is not None:
+            umkm = dict(umkm)
+            umkm_status_cache.set(umkm_id, umkm, generation=generation)
+    return umkm
+
+def invalidate_umkm_status(umkm_id):
+    if umkm_id is None:
+        umkm_status_cache.clear()
+    else:
+        umkm_status_cache.invalidate(int(umkm_id))
+
+register_invalidation_handler('umkm', invalidate_umkm_status)
+
+# Ambil baris UMKM (id_user, status_umkm) paling banyak sekali per request, lalu dipakai bersama
+# oleh decorator policy dan handler lewat g
+def resolve_umkm(umkm_id):
+    umkm_id = int(umkm_id)
+    if 'umkm_rows' not in g:
+        g.umkm_rows = {}
+    if umkm_id not in g.umkm_rows:
+        g.umkm_rows[umkm_id] = get_umkm_status(umkm_id)
+    return g.umkm_rows[umkm_id]
+
+# Aturan policy: kembalikan ALLOW untuk langsung mengizinkan, (pesan, status) untuk menolak,
+# atau None untuk lanjut ke aturan berikutnya
+ALLOW = 'allow'
+
+def admin_bypass(umkm, user):
+    if user.get('role') == 'ADMIN':
+        return ALLOW
+
+def owner_only(umkm, user):
+    if umkm['id_user'] != user.get('id'):
+        return 'Anda tidak diizinkan untuk mengakses atau mengubah UMKM ini', 403
+
+def suspended_denied(umkm, user):
+    if not umkm['status_umkm']:
+        return 'Access denied. UMKM is suspended.', 403
+
+INACTIVE_MESSAGE = 'UMKM tidak aktif, Anda tidak diizinkan untuk melakukan operasi ini'
+
+def inactive_denied(umkm, user):
+    if not umkm['status_umkm']:
+        return INACTIVE_MESSAGE, 403
+
+# UMKM nonaktif hanya ditolak dengan pesan ini untuk yang bukan pemilik (pemilik lanjut ke aturan berikutnya)
+def inactive_non_owner_denied(umkm, user):
+    if not umkm['status_umkm'] and umkm['id_user'] != user.get('id'):
+        return INACTIVE_MESSAGE, 403
+
+def check_umkm_policy(umkm, rules):
+    for rule in rules:
+        result = rule(umkm, g.user)
+        if result == ALLOW:
+            return None
+        if result is not None:
+            return result
+    return None
+
+def _umkm_id_from_request():
+    return request.form.get('id_umkm') or request.view_args.get('umkm_id') or request.args.get('umkm_id')
+
+# Decorator policy UMKM, contoh: @umkm_policy(admin_bypass, suspended_denied, required=True)
+# UMKM yang lolos pemeriksaan tersedia di handler sebagai g.umkm, dan ID-nya (dari form, URL atau
+# query string) sebagai g.umkm_id
+def umkm_policy(*rules, required=False, not_found_message='UMKM tidak ditemukan'):
+    def wrapper(f):
+        @wraps(f)
+        def decorator(*args, **kwargs):
+            umkm_id = _umkm_id_from_request()
+
+            if not umkm_id:
+                if required:
+                    return jsonify({'error': 'UMKM ID tidak ditemukan'}), 400
+                return f(*args, **kwargs)
 
-def umkm_action_allowed(f):
-    @wraps(f)
-    def decorator(*args, **kwargs):
-        umkm_id = request.form.get('id_umkm') or request.view_args.get('umkm_id') or request.args.get('umkm_id')
-        
-        if umkm_id:
-            try:
-                umkm_id = int(umkm_id)  # Convert to int if needed
-            except ValueError:
-                return jsonify({'error': 'Invalid UMKM ID'}), 400
-
-            with get_db_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute('SELECT id_user, status_umkm FROM umkm WHERE id = %s;', (umkm_id,))
-                    umkm = cur.fetchone()
-
-            if not umkm:
-                return jsonify({'error': 'UMKM tidak ditemukan'}), 404
-
-            # Cek jika UMKM tidak aktif dan pengguna bukan admin
-            if not umkm['status_umkm'] and g.user['role'] != 'ADMIN':
-                return jsonify({'error': 'UMKM tidak aktif, Anda tidak diizinkan untuk melakukan operasi ini'}), 403
-
-        return f(*args, **kwargs)
-    return decorator
-
-def umkm_suspended_check(f):
-    @wraps(f)
-    def decorator(*args, **kwargs):
-        umkm_id = request.view_args.get('umkm_id') or request.form.get('id') or request.args.get('id')
-
-        if umkm_id:
             try:
-                umkm_id = int(umkm_id)
+                umkm = resolve_umkm(umkm_id)
             except ValueError:
                 return jsonify({'error': 'Invalid UMKM ID'}), 400
 
-            with get_db_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT status_umkm FROM umkm WHERE id = %s;", (umkm_id,))
-                    umkm = cur.fetchone()
-
             if not umkm:
-                return jsonify({'error': 'UMKM tidak ditemukan'}), 404
+                return jsonify({'error': not_found_message}), 404
 
-            # Cek jika UMKM sedang ditangguhkan dan pengguna bukan admin
-            if not umkm['status_umkm'] and g.user['role'] != 'ADMIN':
-                return jsonify({"error": "Access denied. UMKM is suspended."}), 403
+            denied = check_umkm_policy(umkm, rules)
+            if denied:
+                message, status_code = denied
+                return jsonify({'error': message}), status_code
 
-        return f(*args, **kwargs)
-    return decorator
+            g.umkm = umkm
+            g.umkm_id = int(umkm_id)
+            return f(*args, **kwargs)
+        return decorator
+    return wrapper
 
 def umkm_nonaktif_allowed(f):
     @wraps(f)
     def decorator(*args, **kwargs):
         user_id = request.view_args.get('user_id')
         if user_id:
-            with get_db_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute('SELECT id, id_user FROM umkm WHERE id_user = %s AND status_umkm = FALSE;', (user_id,))
-                    umkms = cur.fetchall()
+            with get_db().cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute('SELECT id, id_user FROM umkm WHERE id_user = %s AND status_umkm = FALSE;', (user_id,))
+                umkms = cur.fetchall()
 
             if not umkms:
                 return jsonify({'error': 'Tidak ada UMKM nonaktif ditemukan untuk user ini'}), 404
@@ -73,34 +131,3 @@ def umkm_nonaktif_allowed(f):
 
         return f(*args, **kwargs)
     return decorator
-
-# Middleware baru untuk memeriksa status suspended UMKM
-def umkm_suspended_check(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        umkm_id = request.form.get('id_umkm') or request.view_args.get('umkm_id') or request.args.get('umkm_id')
-
-        if umkm_id:
-            try:
-                umkm_id = int(umkm_id)
-            except ValueError:
-                return jsonify({'error': 'Invalid UMKM ID'}), 400
-
-            conn = get_db_connection()
-            try:
-                cur = conn.cursor(cursor_factory=RealDictCursor)
-                cur.execute("SELECT status_umkm FROM umkm WHERE id = %s;", (umkm_id,))
-                umkm = cur.fetchone()
-            finally:
-                cur.close()
-                conn.close()
-
-            if not umkm:
-                return jsonify({'error': 'UMKM ID tidak ditemukan'}), 404
-
-            # Cek jika UMKM sedang ditangguhkan dan pengguna bukan admin
-            if not umkm['status_umkm'] and g.user['role'] != 'ADMIN':
-                return jsonify({"error": "Access denied. UMKM is suspended."}), 403
-
-        return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
@@ -0,0 +1,25 @@
+from flask import Blueprint, Response, request, jsonify
+from app.middlewares.auth_middleware import admin_required
+from app.services.export_service import CsvExportStream, EXPORT_STATUSES
+
+export_bp = Blueprint('export_bp', __name__)
+
+# Endpoint /admin/export?status=semua|aktif|nonaktif: seluruh UMKM beserta produknya sebagai CSV,
+# di-stream langsung dari COPY TO STDOUT. Untuk laporan, gunakan ini daripada endpoint JSON.
+# Export Parquet tersedia lewat: python manage.py export --format parquet
+@export_bp.route('/admin/export', methods=['GET'])
+@admin_required
+def export_catalog():
+    status = request.args.get('status', 'semua')
+    export_format = request.args.get('format', 'csv')
+
+    if status not in EXPORT_STATUSES:
+        return jsonify({'error': f"Parameter status tidak valid. Pilih salah satu dari {list(EXPORT_STATUSES)}"}), 400
+    if export_format != 'csv':
+        return jsonify({'error': 'Export lewat HTTP hanya mendukung format csv'}), 400
+
+    return Response(CsvExportStream(status), mimetype='text/csv', headers={
+        'Content-Disposition': f'attachment; filename=umkm_produk_{status}.csv',
+        # Jangan ditampung nginx: chunk langsung diteruskan ke klien
+        'X-Accel-Buffering': 'no'
+    })
@@ -1,20 +1,22 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, current_app
 from app.middlewares.auth_middleware import user_or_admin_required
-from app.middlewares.produk_middleware import umkm_action_allowed, umkm_suspended_check
-from app.services.produk_service import add_produk
+from app.middlewares.umkm_middleware import umkm_policy, admin_bypass, owner_only, suspended_denied, inactive_non_owner_denied
+from app.services.produk_service import add_produk, list_produks, PRODUK_SORTS
+from app.services.produk_import_service import import_produks, detect_format, ImportFormatError, IMPORT_FORMATS
+from app.utils.pagination import get_page_params
+from app.utils.uploads import save_upload, spools_uploads
 
 produk_bp = Blueprint('produk_bp', __name__)
 
-@produk_bp.route('/produk', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@produk_bp.route('/produk', methods=['POST', 'PUT', 'DELETE'])
 @user_or_admin_required
-@umkm_action_allowed
-@umkm_suspended_check
+@umkm_policy(admin_bypass, inactive_non_owner_denied, suspended_denied, required=True)
+@spools_uploads
 def manage_produk():
     if request.method == 'POST':
         id_umkm = request.form.get('id_umkm')
         
-        # Tambahkan log untuk memeriksa apakah id_umkm diterima
-        print(f"Received id_umkm in POST request: {id_umkm}")
+        current_app.logger.debug(f"Received id_umkm in POST request: {id_umkm}")
         
         kode_produk = request.form.get('kode_produk')
         nama_produk = request.form.get('nama_produk')
@@ -31,7 +33,7 @@ def manage_produk():
             'deskripsi': deskripsi,
             'harga': harga,
             'masa_berlaku': masa_berlaku,
-            'foto_produk': foto_produk.filename if foto_produk else None,
+            'foto_produk': save_upload(foto_produk, 'foto_produk') if foto_produk else None,
             'is_publik': is_publik
         }
         # Call service to add produk here
@@ -57,28 +59,55 @@ def manage_produk():
         # Call service to delete produk here
         return jsonify({'message': 'Produk deleted'})
 
-    elif request.method == 'GET':
-        # Ambil parameter dari form-data atau query parameters
-        nama_produk = request.args.get('nama_produk') or request.form.get('nama_produk')
-        kategori = request.args.get('kategori') or request.form.get('kategori')
+    return jsonify({"error": "Method not allowed"}), 405
 
-        # Contoh data produk
-        produk_data = [
-            {"id": 1, "nama": "Produk A", "harga": 10000, "kategori": "elektronik"},
-            {"id": 2, "nama": "Produk B", "harga": 15000, "kategori": "fashion"},
-            {"id": 3, "nama": "Produk C", "harga": 20000, "kategori": "elektronik"},
-        ]
+# Import banyak produk sekaligus untuk satu UMKM dari file CSV/NDJSON (form-data: id_umkm, file, format opsional).
+# Baris dengan kode_produk yang sudah ada diperbarui, sisanya ditambahkan.
+@produk_bp.route('/produk/import', methods=['POST'])
+@user_or_admin_required
+@umkm_policy(admin_bypass, owner_only, suspended_denied, required=True)
+def import_produk():
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'File import harus diisi'}), 400
 
-        # Filter produk berdasarkan query parameters atau form-data jika ada
-        if nama_produk:
-            produk_data = [produk for produk in produk_data if nama_produk.lower() in produk['nama'].lower()]
-        if kategori:
-            produk_data = [produk for produk in produk_data if kategori.lower() == produk['kategori'].lower()]
+    file_format = (request.form.get('format') or request.args.get('format') or '').lower()
+    file_format = file_format or detect_format(file.filename, file.mimetype)
+    if file_format not in IMPORT_FORMATS:
+        return jsonify({'error': f"Format file tidak valid. Pilih salah satu dari {list(IMPORT_FORMATS)}"}), 400
 
-        # Call service to get produk here
-        return jsonify(produk_data)
+    try:
+        result = import_produks(g.umkm_id, file.stream, file_format)
+    except ImportFormatError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result), 200
 
-    return jsonify({"error": "Method not allowed"}), 405
+# Daftar produk: filter, urutan dan pagination dijalankan di database (?limit=&after=)
+@produk_bp.route('/produk', methods=['GET'])
+@user_or_admin_required
+def list_produk():
+    # Ambil parameter dari form-data atau query parameters
+    nama_produk = request.args.get('nama_produk') or request.form.get('nama_produk')
+    kategori = request.args.get('kategori') or request.form.get('kategori')
+    id_umkm = request.args.get('id_umkm')
+    sort = request.args.get('sort', 'id')
+    order = request.args.get('order', 'asc').lower()
+
+    if sort not in PRODUK_SORTS:
+        return jsonify({'error': f"Parameter sort tidak valid. Pilih salah satu dari {list(PRODUK_SORTS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': "Parameter order harus 'asc' atau 'desc'"}), 400
+    if id_umkm is not None:
+        try:
+            id_umkm = int(id_umkm)
+        except ValueError:
+            return jsonify({'error': 'Invalid UMKM ID'}), 400
+
+    produks, next_cursor = list_produks(
+        get_page_params(), nama_produk=nama_produk, kategori=kategori, id_umkm=id_umkm,
+        sort=sort, descending=order == 'desc', include_private=g.user['role'] == 'ADMIN'
+    )
+    return jsonify({'data': produks, 'next_cursor': next_cursor}), 200
 
 @produk_bp.route('/produk/publish', methods=['PUT'])
 @user_or_admin_required
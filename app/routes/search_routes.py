@@ -0,0 +1,27 @@
+from flask import Blueprint, request, jsonify, g
+from app.middlewares.auth_middleware import user_or_admin_required
+from app.services.search_service import search_produks, search_umkms, build_prefix_query, SEARCH_TYPES
+from app.utils.pagination import get_page_params
+
+search_bp = Blueprint('search_bp', __name__)
+
+# Endpoint /search?q=&type=produk|umkm, hasil terurut relevansi dengan pagination ?limit=&after=
+@search_bp.route('/search', methods=['GET'])
+@user_or_admin_required
+def search():
+    q = (request.args.get('q') or '').strip()
+    search_type = request.args.get('type', 'produk')
+
+    if not q or build_prefix_query(q) is None:
+        return jsonify({'error': "Parameter 'q' harus diisi."}), 400
+    if search_type not in SEARCH_TYPES:
+        return jsonify({'error': f"Parameter type tidak valid. Pilih salah satu dari {list(SEARCH_TYPES)}"}), 400
+
+    # UMKM yang disuspend hanya terlihat oleh admin
+    include_suspended = g.user['role'] == 'ADMIN'
+    if search_type == 'produk':
+        results, next_cursor = search_produks(q, get_page_params(), include_suspended)
+    else:
+        results, next_cursor = search_umkms(q, get_page_params(), include_suspended)
+
+    return jsonify({'data': results, 'next_cursor': next_cursor}), 200
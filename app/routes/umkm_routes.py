@@ -1,22 +1,27 @@
 from flask import Blueprint, request, jsonify, g, current_app
 from app.middlewares.auth_middleware import admin_required, user_or_admin_required, user_required
-from app.middlewares.umkm_middleware import umkm_action_allowed, umkm_suspended_check
-from app.services.umkm_service import get_missing_id, update_umkm_by_id
+from app.middlewares.umkm_middleware import umkm_policy, resolve_umkm, admin_bypass, suspended_denied, inactive_denied
+from app.services.umkm_service import update_umkm_by_id
 from psycopg2.extras import RealDictCursor
-from app.utils.db import get_db_connection
-import os
-from app.services.umkm_service import get_umkm_detail, get_umkms, fetch_all_umkm, fetch_umkm_by_user_id
-from werkzeug.utils import secure_filename
-from werkzeug.datastructures import FileStorage
+from app.utils.db import get_db
+from app.utils.invalidation import publish_invalidation
+from app.services.umkm_service import get_umkm_detail, fetch_all_umkm, fetch_umkm_by_user_id, fetch_nonaktif_umkm
+from app.utils.pagination import get_page_params
+from app.utils.streaming import wants_stream, stream_json
+from app.services.umkm_service import iter_all_umkm, iter_nonaktif_umkm, release_umkm_uploads
+from app.services.produk_service import attach_produks
+from app.services.dashboard_service import get_total_statistik
+from app.utils.uploads import save_upload, spools_uploads
+from app.utils.thumbnails import upload_variants
 
 umkm_bp = Blueprint('umkm_bp', __name__)
 
 @umkm_bp.route('/umkm', methods=['POST', 'PUT', 'DELETE'])
 @user_or_admin_required
-@umkm_action_allowed
-@umkm_suspended_check
+@umkm_policy(admin_bypass, inactive_denied)
+@spools_uploads
 def manage_umkm():
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     if request.method == 'POST':
@@ -47,54 +52,20 @@ def manage_umkm():
         # Atur status_umkm ke True secara default jika tidak ada dalam permintaan
         status_umkm = request.form.get('status_umkm', 'true').lower() == 'true'
 
-        uploads_dir = os.path.join(current_app.root_path, 'uploads')
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir)
-
-        foto_umkm_path = None
-        dokumen_path = None
-
-        if foto_umkm:
-            foto_umkm_path = os.path.join(uploads_dir, secure_filename(foto_umkm.filename))
-            foto_umkm.save(foto_umkm_path)
-
-        if dokumen:
-            dokumen_path = os.path.join(uploads_dir, secure_filename(dokumen.filename))
-            dokumen.save(dokumen_path)
-
-        umkm_data = {
-            'id_user': id_user,
-            'nama': nama,
-            'kategori': kategori,
-            'deskripsi': deskripsi,
-            'alamat': alamat,
-            'no_kontak': no_kontak,
-            'npwp': npwp,
-            'jam_buka': jam_buka,
-            'foto_umkm': foto_umkm_path,
-            'dokumen': dokumen_path,
-            'status_umkm': status_umkm
-        }
-
-        # Ambil missing ID dari tabel umkm jika ada
-        cur.execute('SELECT COALESCE(MAX(id), 0) + 1 AS new_id FROM umkm')
-        umkm_row = cur.fetchone()
-        umkm_id = umkm_row['new_id'] if umkm_row else 1
+        # Kolom foto_umkm/dokumen menyimpan key upload; checksum dan dedup diproses setelah commit
+        foto_umkm_key = save_upload(foto_umkm, 'foto_umkm') if foto_umkm else None
+        dokumen_key = save_upload(dokumen, 'dokumen') if dokumen else None
 
+        # id diisi oleh sequence/identity di database
         cur.execute('''
-            INSERT INTO umkm (id, id_user, nama, kategori, deskripsi, alamat, no_kontak, npwp, jam_buka, foto_umkm, dokumen, status_umkm)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *;
+            INSERT INTO umkm (id_user, nama, kategori, deskripsi, alamat, no_kontak, npwp, jam_buka, foto_umkm, dokumen, status_umkm)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING *;
         ''', (
-            umkm_id, id_user, nama, kategori, deskripsi, alamat, no_kontak, npwp, jam_buka, 
-            foto_umkm.filename if foto_umkm else None, dokumen.filename if dokumen else None, status_umkm
+            id_user, nama, kategori, deskripsi, alamat, no_kontak, npwp, jam_buka, 
+            foto_umkm_key, dokumen_key, status_umkm
         ))
         umkm = cur.fetchone()
-        conn.commit()
         cur.close()
-        conn.close()
-
-        umkm['foto_umkm'] = foto_umkm_path
-        umkm['dokumen'] = dokumen_path
 
         return jsonify(umkm), 201
 
@@ -106,8 +77,10 @@ def manage_umkm():
         if not umkm_id:
             return jsonify({"error": "Field 'id' harus diisi."}), 400
 
-        cur.execute('SELECT id_user FROM umkm WHERE id = %s;', (umkm_id,))
-        umkm = cur.fetchone()
+        try:
+            umkm = resolve_umkm(umkm_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid UMKM ID'}), 400
 
         if not umkm:
             return jsonify({"error": "UMKM tidak ditemukan."}), 404
@@ -139,22 +112,14 @@ def manage_umkm():
             return jsonify({"error": "Field 'no_kontak' harus diisi."}), 400
 
         # Menangani file unggahan
-        uploads_dir = os.path.join(current_app.root_path, 'uploads')
-        if not os.path.exists(uploads_dir):
-            os.makedirs(uploads_dir)
-
         foto_umkm = request.files.get('foto_umkm')
         dokumen = request.files.get('dokumen')
 
         if foto_umkm:
-            foto_umkm_path = os.path.join(uploads_dir, secure_filename(foto_umkm.filename))
-            foto_umkm.save(foto_umkm_path)
-            data['foto_umkm'] = foto_umkm_path
+            data['foto_umkm'] = save_upload(foto_umkm, 'foto_umkm')
 
         if dokumen:
-            dokumen_path = os.path.join(uploads_dir, secure_filename(dokumen.filename))
-            dokumen.save(dokumen_path)
-            data['dokumen'] = dokumen_path
+            data['dokumen'] = save_upload(dokumen, 'dokumen')
 
         # Hanya admin yang bisa mengubah status_umkm
         if user_role == 'ADMIN' and request.form.get('status_umkm') is not None:
@@ -170,19 +135,21 @@ def manage_umkm():
             return jsonify({"error": "Field 'id' harus diisi untuk menghapus UMKM."}), 400
 
         id_user = g.user['id']
-        cur.execute('SELECT id_user FROM umkm WHERE id = %s;', (umkm_id,))
-        umkm = cur.fetchone()
+        try:
+            umkm = resolve_umkm(umkm_id)
+        except ValueError:
+            return jsonify({'error': 'Invalid UMKM ID'}), 400
 
         if not umkm or umkm['id_user'] != id_user:
             return jsonify({"error": "You can only delete your own UMKM."}), 403
 
+        release_umkm_uploads([int(umkm_id)])
         cur.execute('DELETE FROM umkm WHERE id = %s RETURNING *;', (umkm_id,))
         umkm = cur.fetchone()
-        conn.commit()
         cur.close()
-        conn.close()
 
         if umkm:
+            publish_invalidation('umkm', umkm['id'])
             return jsonify(umkm)
         else:
             return jsonify({'error': 'UMKM tidak ditemukan atau gagal dihapus'}), 404
@@ -191,7 +158,7 @@ def manage_umkm():
 
 @umkm_bp.route('/umkm/<int:umkm_id>', methods=['GET'])
 @user_or_admin_required
-@umkm_suspended_check
+@umkm_policy(admin_bypass, suspended_denied, not_found_message='UMKM ID tidak ditemukan')
 def get_umkm_detail_route(umkm_id):
     umkm_detail = get_umkm_detail(umkm_id, g.user['role'])
     if not umkm_detail:
@@ -200,27 +167,29 @@ def get_umkm_detail_route(umkm_id):
 
 @umkm_bp.route('/umkm', methods=['GET'])
 def get_umkms_route():
-    umkms = fetch_all_umkm()
-    
-    response = []
-    for umkm in umkms:
-        if umkm.get('status_umkm'):  # Menyaring UMKM yang aktif
-            response.append({
-                "id": umkm['id'],
-                "nama": umkm['nama']
-            })
-        else:
-            # Menggunakan dict untuk memastikan JSON serializable
-            response.append({
-                "message": f"data umkm dengan id: {umkm['id']} telah di suspended"
-            })
-    
-    return jsonify(response), 200
+    if wants_stream():
+        return stream_json(iter_all_umkm(), transform=umkm_list_item)
+
+    umkms, next_cursor = fetch_all_umkm(get_page_params())
+    response = [umkm_list_item(umkm) for umkm in umkms]
+    return jsonify({'data': response, 'next_cursor': next_cursor}), 200
+
+def umkm_list_item(umkm):
+    if umkm.get('status_umkm'):  # Menyaring UMKM yang aktif
+        return {
+            "id": umkm['id'],
+            "nama": umkm['nama'],
+            "foto_umkm_variants": upload_variants(umkm.get('foto_umkm'))
+        }
+    # Menggunakan dict untuk memastikan JSON serializable
+    return {
+        "message": f"data umkm dengan id: {umkm['id']} telah di suspended"
+    }
 
 # Endpoint untuk /umkm/user/<int:user_id>
 @umkm_bp.route('/umkm/user/<int:user_id>', methods=['GET'])
 def get_umkms_by_user(user_id):
-    umkms = fetch_umkm_by_user_id(user_id)
+    umkms, next_cursor = fetch_umkm_by_user_id(user_id, get_page_params())
 
     response = []
     for umkm in umkms:
@@ -232,6 +201,7 @@ def get_umkms_by_user(user_id):
                 "deskripsi": umkm['deskripsi'],
                 "dokumen": umkm.get('dokumen'),  # Memastikan dokumen ada
                 "foto_umkm": umkm.get('foto_umkm'),  # Memastikan foto_umkm ada
+                "foto_umkm_variants": upload_variants(umkm.get('foto_umkm')),
                 "jam_buka": umkm['jam_buka'],
                 "kategori": umkm['kategori'],
                 "no_kontak": umkm['no_kontak'],
@@ -245,57 +215,42 @@ def get_umkms_by_user(user_id):
                 "message": f"data umkm dengan id: {umkm['id']} telah di suspended"
             })
     
-    return jsonify(response), 200
+    return jsonify({'data': response, 'next_cursor': next_cursor}), 200
 
 @umkm_bp.route('/umkm/nonaktif', methods=['GET'])
 @admin_required
 def get_nonaktif_umkm():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    user_id = None if g.user['role'] == 'ADMIN' else g.user['id']
+    if wants_stream():
+        # Produk dimuat per batch UMKM, tetap satu query per batch
+        return stream_json(iter_nonaktif_umkm(user_id), batch_transform=attach_produks)
 
+    page = get_page_params()
     if g.user['role'] == 'ADMIN':
-        cur.execute('SELECT * FROM umkm WHERE status_umkm = FALSE;')
+        umkms, next_cursor = fetch_nonaktif_umkm(page)
     else:
-        cur.execute('SELECT * FROM umkm WHERE status_umkm = FALSE AND id_user = %s;', (g.user['id'],))
+        umkms, next_cursor = fetch_nonaktif_umkm(page, g.user['id'])
 
-    umkms = cur.fetchall()
-    umkm_data = []
+    # Produk semua UMKM di halaman ini diambil dengan satu query, bukan satu query per UMKM
+    umkm_data = attach_produks(umkms)
 
-    for umkm in umkms:
-        cur.execute('SELECT * FROM produk WHERE id_umkm = %s;', (umkm['id'],))
-        products = cur.fetchall()
-        umkm['products'] = products
-        umkm_data.append(umkm)
-
-    cur.close()
-    conn.close()
-
-    return jsonify(umkm_data)
+    return jsonify({'data': umkm_data, 'next_cursor': next_cursor})
 
 @umkm_bp.route('/umkm/nonaktif/<int:user_id>', methods=['GET', 'DELETE'])
 @admin_required
 def manage_nonaktif_umkm_by_user(user_id):
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     if request.method == 'GET':
-        cur.execute('SELECT * FROM umkm WHERE id_user = %s AND status_umkm = FALSE;', (user_id,))
-        umkms = cur.fetchall()
-        if not umkms:
-            cur.close()
-            conn.close()
+        cur.close()
+        page = get_page_params()
+        umkms, next_cursor = fetch_nonaktif_umkm(page, user_id)
+        if not umkms and page.after is None:
             return jsonify({'error': 'Tidak ada UMKM nonaktif ditemukan untuk user ini'}), 404
 
-        umkm_data = []
-        for umkm in umkms:
-            cur.execute('SELECT * FROM produk WHERE id_umkm = %s;', (umkm['id'],))
-            products = cur.fetchall()
-            umkm['products'] = products
-            umkm_data.append(umkm)
-        
-        cur.close()
-        conn.close()
-        return jsonify(umkm_data)
+        umkm_data = attach_produks(umkms)
+        return jsonify({'data': umkm_data, 'next_cursor': next_cursor})
 
     elif request.method == 'DELETE':
         umkm_id = request.form.get('id')
@@ -303,21 +258,19 @@ def manage_nonaktif_umkm_by_user(user_id):
         # Periksa apakah field id diisi
         if not umkm_id:
             cur.close()
-            conn.close()
             return jsonify({"error": "Field 'id' wajib diisi untuk melakukan delete."}), 400
 
         cur.execute('SELECT * FROM umkm WHERE id = %s AND id_user = %s AND status_umkm = FALSE;', (umkm_id, user_id))
         umkm = cur.fetchone()
         if not umkm:
             cur.close()
-            conn.close()
             return jsonify({'error': 'UMKM tidak ditemukan atau tidak nonaktif'}), 404
 
+        release_umkm_uploads([umkm['id']])
         cur.execute('DELETE FROM umkm WHERE id = %s AND id_user = %s AND status_umkm = FALSE RETURNING *;', (umkm_id, user_id))
         deleted_umkm = cur.fetchone()
-        conn.commit()
         cur.close()
-        conn.close()
+        publish_invalidation('umkm', deleted_umkm['id'])
         return jsonify(deleted_umkm)
 
     return jsonify({'error': 'Invalid method'}), 405
@@ -334,7 +287,7 @@ def change_umkm_status():
     if not status:
         return jsonify({"error": "Field 'status' wajib diisi untuk mengubah status UMKM."}), 400
 
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
     cur.execute('SELECT id_user FROM umkm WHERE id = %s;', (umkm_id,))
@@ -342,7 +295,6 @@ def change_umkm_status():
 
     if not umkm:
         cur.close()
-        conn.close()
         return jsonify({'error': 'UMKM tidak ditemukan'}), 404
 
     cur.execute('''
@@ -351,12 +303,13 @@ def change_umkm_status():
         WHERE id = %s RETURNING *;
     ''', (status, umkm_id))
     umkm = cur.fetchone()
-    conn.commit()
     cur.close()
-    conn.close()
+
+    # Cache status UMKM di semua worker dibuang setelah commit
+    publish_invalidation('umkm', umkm['id'])
     return jsonify(umkm)
 
 @umkm_bp.route('/admin/dashboard', methods=['GET'])
 @admin_required
 def admin_dashboard():
-    return jsonify({"message": "Welcome to Admin lobby"})
+    return jsonify({"message": "Welcome to Admin lobby", "statistik": get_total_statistik()})
@@ -0,0 +1,104 @@
+import mimetypes
+import os
+from flask import Blueprint, request, jsonify, send_file, send_from_directory, make_response, g
+from werkzeug.utils import secure_filename
+from app.middlewares.auth_middleware import user_or_admin_required
+from app.utils.uploads import get_upload, find_upload_references, blob_path, upload_dir
+from app.utils.thumbnails import variant_path
+from config import Config
+
+upload_bp = Blueprint('upload_bp', __name__)
+
+# Key upload selalu menunjuk isi yang sama (hash), jadi boleh di-cache lama oleh browser
+IMMUTABLE_CACHE_CONTROL = f'private, max-age={Config.UPLOAD_CACHE_MAX_AGE}, immutable'
+
+FILE_DENIED_MESSAGE = 'Anda tidak diizinkan untuk mengakses file ini'
+
+# Content-Type upload berasal dari klien, jadi tidak dipercaya: selain gambar/PDF di UPLOAD_INLINE_TYPES,
+# file dikirim sebagai application/octet-stream dan attachment agar tidak dirender browser (misal HTML/SVG)
+def safe_content_type(mimetype):
+    mimetype = (mimetype or '').lower()
+    if mimetype in Config.UPLOAD_INLINE_TYPES:
+        return mimetype, False
+    return 'application/octet-stream', True
+
+# Dokumen UMKM hanya boleh dibaca admin dan pemilik UMKM-nya (dokumen yang belum dipakai UMKM mana pun
+# hanya oleh admin); foto boleh dibaca semua user yang login
+def can_read_upload(references, kind=None):
+    if g.user['role'] == 'ADMIN':
+        return True
+    owners = {id_user for column, id_user in references if column == 'dokumen'}
+    if kind == 'dokumen' or owners:
+        return g.user['id'] in owners
+    return True
+
+@upload_bp.route('/uploads/<key>', methods=['GET'])
+@user_or_admin_required
+def serve_upload(key):
+    upload = get_upload(key)
+    if not upload:
+        return serve_legacy_upload(key)
+    if upload['kind'] == 'dokumen' and not can_read_upload(find_upload_references(key), upload['kind']):
+        return jsonify({'error': FILE_DENIED_MESSAGE}), 403
+
+    path = blob_path(upload['sha256'])
+    etag = upload['sha256']
+    mimetype, attachment = safe_content_type(upload['content_type'])
+    download_name = upload['original_name'] or key
+    cache_control = IMMUTABLE_CACHE_CONTROL
+
+    size = request.args.get('size', type=int)
+    if size is not None:
+        if size not in Config.THUMBNAIL_SIZES:
+            return jsonify({'error': f'Ukuran tidak valid. Pilih salah satu dari {list(Config.THUMBNAIL_SIZES)}'}), 400
+        thumbnail = variant_path(upload['sha256'], size)
+        if os.path.exists(thumbnail):
+            path, etag = thumbnail, f"{upload['sha256']}-{size}"
+            mimetype, attachment = safe_content_type('image/webp')
+        else:
+            # Thumbnail belum selesai dibuat: kirim file asli, tapi jangan di-cache di URL thumbnail
+            cache_control = 'private, no-cache'
+
+    if not os.path.exists(path):
+        return jsonify({'error': 'File tidak ditemukan'}), 404
+
+    if Config.UPLOAD_ACCEL_REDIRECT:
+        response = accel_redirect_response(path, etag, mimetype, attachment, download_name)
+    else:
+        # send_file memakai X-Sendfile jika USE_X_SENDFILE aktif, atau wsgi.file_wrapper (sendfile)
+        # dari server WSGI; Range dan If-None-Match ditangani oleh conditional=True
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, as_attachment=attachment,
+                             download_name=download_name, max_age=None)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+# nginx yang mengirim file (internal location UPLOAD_ACCEL_REDIRECT), worker Python langsung bebas
+def accel_redirect_response(path, etag, mimetype, attachment, download_name):
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response('')
+        relative = os.path.relpath(path, upload_dir()).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = Config.UPLOAD_ACCEL_REDIRECT.rstrip('/') + '/' + relative
+        response.headers['Content-Type'] = mimetype
+        if attachment:
+            response.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(download_name) or "download"}"'
+    response.set_etag(etag)
+    return response
+
+# File lama yang disimpan dengan nama aslinya langsung di folder uploads (sebelum ada blob store).
+# Hanya file yang masih dipakai di kolom foto_umkm/dokumen/foto_produk yang disajikan, bukan file
+# lain apa pun yang kebetulan ada di folder tersebut.
+def serve_legacy_upload(filename):
+    filename = secure_filename(filename)
+    references = find_upload_references(filename) if filename else []
+    if not references or not os.path.isfile(os.path.join(upload_dir(), filename)):
+        return jsonify({'error': 'File tidak ditemukan'}), 404
+    if not can_read_upload(references):
+        return jsonify({'error': FILE_DENIED_MESSAGE}), 403
+    mimetype, attachment = safe_content_type(mimetypes.guess_type(filename)[0])
+    response = send_from_directory(upload_dir(), filename, conditional=True, mimetype=mimetype,
+                                   as_attachment=attachment)
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
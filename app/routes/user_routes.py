@@ -3,11 +3,17 @@ from app.services.auth_service import add_user, authenticate_user
 from app.middlewares.auth_middleware import user_or_admin_required, admin_required
 import jwt
 from config import Config
-from app.services.user_service import get_user_by_id, get_all_users, get_first_empty_id
-from app.services.umkm_service import get_umkms
-from app.services.produk_service import get_all_produks
+from app.services.user_service import get_user_by_id, fetch_users_page, fetch_user_summaries_page, iter_users
+from app.utils.streaming import wants_stream, stream_json
+from app.utils.pagination import get_page_params
+from app.services.dashboard_service import fetch_umkm_statistik_page, get_total_statistik
 from psycopg2.extras import RealDictCursor
-from app.utils.db import get_db_connection
+from app.utils.db import get_db
+from app.utils.invalidation import publish_invalidation
+from app.utils.metrics import collect_metrics
+from app.utils.password_utils import hash_password_bounded
+from app.utils.audit import record_login_event
+from app.services.umkm_service import release_umkm_uploads
 
 user_bp = Blueprint('user_bp', __name__)
 
@@ -33,14 +39,7 @@ def auth():
             return jsonify({'error': f"Role tidak valid: {role}. Role harus salah satu dari {valid_roles}"}), 400
 
         try:
-            # penggunaan id kosong
-            empty_id = get_first_empty_id()
-            if empty_id:
-                user = add_user(no_hp, password, role, empty_id)
-            else:
-                return jsonify({'error': 'Tidak ada ID yang tersedia untuk digunakan'}), 500
-            
-            token = jwt.encode({'id': user['id'], 'no_hp': no_hp, 'role': role}, current_app.config['SECRET_KEY'], algorithm='HS256')
+            user = add_user(no_hp, password, role)
         except ValueError as ve:
             return jsonify({'error': str(ve)}), 400
         except Exception as e:
@@ -54,7 +53,7 @@ def auth():
             'suspended': user.get('suspended'),
             'log': user['log'],
             'timestamp': user['timestamp'],
-            'token': token
+            'token': user['token']
         }), 201
 
     # Jika role tidak diberikan, tidak dapat login
@@ -65,6 +64,9 @@ def auth():
             return {"error": "Password harus diisi"}, 400
 
         user = authenticate_user(no_hp, password)
+        record_login_event('login', bool(user), user_id=user['id'] if user else None, no_hp=no_hp,
+                           ip_address=request.remote_addr, user_agent=request.user_agent.string,
+                           created_at=user['timestamp'] if user else None)
         if user:
             try:
 
@@ -85,30 +87,32 @@ def auth():
 @user_bp.route('/user', methods=['GET', 'POST', 'PUT', 'DELETE'])
 @user_or_admin_required
 def manage_user():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
     if request.method == 'POST':
         no_hp = request.form.get('no_hp')
         password = request.form.get('password')
         role = request.form.get('role')
 
-        user = add_user(no_hp, password, role)
+        try:
+            user = add_user(no_hp, password, role)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
         return jsonify(user), 201
 
-    elif request.method == 'GET':
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+
+    if request.method == 'GET':
         if g.user['role'] == 'ADMIN':
-            cur.execute('SELECT * FROM "user";')
-            users = cur.fetchall()
             cur.close()
-            conn.close()
-            return jsonify(users), 200
+            if wants_stream():
+                return stream_json(iter_users())
+            users, next_cursor = fetch_users_page(get_page_params())
+            return jsonify({'data': users, 'next_cursor': next_cursor}), 200
         else:
             user_id = g.user['id']
             cur.execute('SELECT * FROM "user" WHERE id = %s;', (user_id,))
             user = cur.fetchone()
             cur.close()
-            conn.close()
 
             if not user:
                 return jsonify({'error': 'User tidak ditemukan'}), 404
@@ -150,7 +154,7 @@ def manage_user():
             if len(password) < 6:
                 return jsonify({'error': 'Password harus minimal 6 karakter'}), 400
             update_fields.append('password = %s')
-            update_values.append(password)
+            update_values.append(hash_password_bounded(password))
 
         # Validasi role
         if role:
@@ -172,7 +176,6 @@ def manage_user():
             ''', tuple(update_values))
 
             updated_user = cur.fetchone()
-            conn.commit()
 
             if updated_user:
                 return jsonify(updated_user), 200
@@ -188,17 +191,22 @@ def manage_user():
         if not user_id:
             return jsonify({'error': 'ID pengguna harus diisi untuk menghapus'}), 400
 
+        # Upload UMKM milik user dilepas karena UMKM-nya ikut terhapus
+        cur.execute('SELECT id FROM umkm WHERE id_user = %s;', (user_id,))
+        release_umkm_uploads([row['id'] for row in cur.fetchall()])
+
         cur.execute('DELETE FROM "user" WHERE id = %s RETURNING *;', (user_id,))
         deleted_user = cur.fetchone()
-        conn.commit()
 
         if deleted_user:
+            publish_invalidation('user', deleted_user['id'])
+            # UMKM milik user ikut terhapus, jadi cache status UMKM dikosongkan
+            publish_invalidation('umkm', None)
             return jsonify({'message': 'User deleted'}), 200
         else:
             return jsonify({'error': 'User tidak ditemukan'}), 404
 
     cur.close()
-    conn.close()
 
 # Endpoint /user/role
 @user_bp.route('/user/role', methods=['PUT'])
@@ -225,7 +233,7 @@ def suspend_user():
 
     suspend_status_bool = True if suspend_status == 'true' else False
 
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor()
 
     # Update suspend status in the database
@@ -236,12 +244,12 @@ def suspend_user():
     ''', (suspend_status_bool, user_id))
 
     updated_user = cur.fetchone()
-    conn.commit()
 
     cur.close()
-    conn.close()
 
     if updated_user:
+        # Cache status suspend di semua worker dibuang setelah commit
+        publish_invalidation('user', updated_user[0])
         return jsonify({'message': f"User {'suspended' if suspend_status_bool else 'unsuspended'} successfully"}), 200
     else:
         return jsonify({'error': 'User tidak ditemukan atau gagal diperbarui'}), 404
@@ -262,47 +270,58 @@ def admin_add_user():
     if role not in ['USER', 'ADMIN']:
         return jsonify({'error': 'Role tidak valid. Role yang diperbolehkan hanya "USER" atau "ADMIN".'}), 400
 
-    user = add_user(no_hp, password, role)
+    try:
+        user = add_user(no_hp, password, role)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
     return jsonify(user), 201
 
+# Endpoint /admin/metrics
+@user_bp.route('/admin/metrics', methods=['GET'])
+@admin_required
+def admin_metrics():
+    return jsonify(collect_metrics()), 200
+
 # Endpoint /dashboard
 @user_bp.route('/dashboard', methods=['GET'])
 @user_or_admin_required
 def get_dashboard():
-    # Mengambil data UMKM
-    umkms = get_umkms()
-
-    # Mengambil data produk
-    produks = get_all_produks()
+    # Statistik dibaca dari tabel ringkasan yang dijaga oleh jalur tulis produk/UMKM. Daftar UMKM dan
+    # user hanya halaman pertama (?limit=); halaman berikutnya lewat /dashboard/umkm dan /dashboard/users
+    page = get_page_params()._replace(after=None)
+    umkm_statistik, umkm_next_cursor = fetch_umkm_statistik_page(page)
+    total = get_total_statistik()
 
     # Mengambil data user
-    users = get_all_users()
-
-    # Menghitung statistik UMKM
-    umkm_statistik = []
-    for umkm in umkms:
-        produk_all = sum(1 for p in produks if p['id_umkm'] == umkm['id'])
-        produk_publish = sum(1 for p in produks if p['id_umkm'] == umkm['id'] and p['is_publik'])
-        produk_unpublish = produk_all - produk_publish
-        
-        umkm_statistik.append({
-            "id": umkm['id'],
-            "nama": umkm['nama'],
-            "produk_all": produk_all,
-            "produk_publish": produk_publish,
-            "produk_unpublish": produk_unpublish
-        })
+    users, users_next_cursor = fetch_user_summaries_page(page)
 
     # Menyusun response JSON
     response = {
         "produks": [],
-        "total_produk": len(produks),
-        "total_publish": sum(1 for p in produks if p['is_publik']),
-        "total_umkm": len(umkms),
-        "total_unpublish": len(produks) - sum(1 for p in produks if p['is_publik']),
+        "total_produk": total['total_produk'],
+        "total_publish": total['total_publish'],
+        "total_umkm": total['total_umkm'],
+        "total_unpublish": total['total_unpublish'],
         "umkm_statistik": umkm_statistik,
         "umkms": umkm_statistik,
-        "users": users
+        "umkm_statistik_next_cursor": umkm_next_cursor,
+        "users": users,
+        "users_next_cursor": users_next_cursor,
+        "statistik_updated_at": total['updated_at']
     }
 
     return jsonify(response)
+
+# Endpoint /dashboard/umkm: statistik per UMKM halaman berikutnya (?limit=&after=)
+@user_bp.route('/dashboard/umkm', methods=['GET'])
+@user_or_admin_required
+def get_dashboard_umkm():
+    umkm_statistik, next_cursor = fetch_umkm_statistik_page(get_page_params())
+    return jsonify({'data': umkm_statistik, 'next_cursor': next_cursor}), 200
+
+# Endpoint /dashboard/users: daftar user dashboard halaman berikutnya (?limit=&after=)
+@user_bp.route('/dashboard/users', methods=['GET'])
+@user_or_admin_required
+def get_dashboard_users():
+    users, next_cursor = fetch_user_summaries_page(get_page_params())
+    return jsonify({'data': users, 'next_cursor': next_cursor}), 200
@@ -1,4 +1,5 @@
 from .auth_service import add_user, authenticate_user
-from .umkm_service import get_missing_id
+from .umkm_service import get_umkm_detail
 from .user_service import get_user_by_id
-from .produk_service import add_produk
\ No newline at end of file
+from .produk_service import add_produk
+from .dashboard_service import fetch_umkm_statistik_page, get_total_statistik
\ No newline at end of file
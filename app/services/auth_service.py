@@ -1,69 +1,128 @@
+import os
+import threading
+from collections import deque
+
 import jwt
 from flask import current_app as app
-from app.utils.db import get_db_connection
-from psycopg2.extras import RealDictCursor
+from app.utils.db import get_db, db_connection, release_db
+from app.utils.password_utils import hash_password, hash_password_bounded, verify_password_bounded, needs_rehash, PREFIX
+from psycopg2.extras import RealDictCursor, execute_batch
+from psycopg2 import errors
 from datetime import datetime
+from config import Config
+
+# Hash pembanding saat no_hp tidak ditemukan, agar waktu respons tidak membocorkan user mana yang terdaftar
+_DUMMY_HASH = None
+
+_user_ids = deque()
+_user_ids_pid = None
+_user_ids_lock = threading.Lock()
 
-def add_user(no_hp, password, role, user_id):
+# id user diambil dari sequence per blok USER_ID_BLOCK_SIZE dengan satu query, lalu dibagikan dari memori.
+# Token bisa dibuat sebelum insert, dan registrasi cukup satu INSERT. Nilai sequence tidak transaksional,
+# jadi id dalam blok tidak pernah dipakai dua kali (sisa blok saat proses berhenti hanya jadi celah id).
+def _next_user_id(cur):
+    global _user_ids_pid
+    with _user_ids_lock:
+        if _user_ids_pid != os.getpid():
+            _user_ids.clear()
+            _user_ids_pid = os.getpid()
+        if not _user_ids:
+            cur.execute('''
+                SELECT nextval(pg_get_serial_sequence('"user"', 'id')) AS id
+                FROM generate_series(1, %s);
+            ''', (Config.USER_ID_BLOCK_SIZE,))
+            _user_ids.extend(sorted(row['id'] for row in cur.fetchall()))
+        return _user_ids.popleft()
+
+def add_user(no_hp, password, role):
     # Validasi role
     valid_roles = ['USER', 'ADMIN']
     if role not in valid_roles:
         raise ValueError(f"Role tidak valid: {role}. Role harus salah satu dari {valid_roles}")
 
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-
+    # Hash dihitung tanpa memegang koneksi pool: antrian hash bisa jauh lebih panjang dari ukuran pool,
+    # dan request yang menunggu hash tidak boleh membuat endpoint lain kehabisan koneksi
+    release_db()
+    password_hash = hash_password_bounded(password)
     timestamp = datetime.now()
 
-    cur.execute('''
-        INSERT INTO "user" (id, no_hp, log, password, role, timestamp)
-        VALUES (%s, %s, %s, %s, %s, %s) RETURNING *;
-    ''', (user_id, no_hp, f'Registration log: {timestamp}', password, role, timestamp))
-    
-    user = cur.fetchone()
-    conn.commit()
-
-    token = jwt.encode({'id': user['id'], 'no_hp': no_hp, 'role': role}, app.config['SECRET_KEY'], algorithm='HS256')
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    # Update token di database
-    cur.execute('''
-        UPDATE "user" SET token = %s WHERE id = %s;
-    ''', (token, user['id']))
-    conn.commit()
+    # id sudah diketahui sebelum insert (lihat _next_user_id), sehingga user dan token tersimpan dengan
+    # satu INSERT, bukan INSERT lalu UPDATE token
+    user_id = _next_user_id(cur)
+    token = issue_token(user_id, no_hp, role)
 
-    # Memasukkan token ke dalam objek user
-    user['token'] = token
+    try:
+        cur.execute('''
+            INSERT INTO "user" (id, no_hp, log, password, role, timestamp, token)
+            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING *;
+        ''', (user_id, no_hp, f'Registration log: {timestamp}', password_hash, role, timestamp, token))
+    except errors.UniqueViolation:
+        cur.close()
+        raise ValueError(f"Nomor HP {no_hp} sudah terdaftar")
 
+    user = cur.fetchone()
     cur.close()
-    conn.close()
     return user
 
+def issue_token(user_id, no_hp, role):
+    return jwt.encode({'id': user_id, 'no_hp': no_hp, 'role': role}, app.config['SECRET_KEY'], algorithm='HS256')
+
+# Koneksi hanya dipinjam sebentar untuk membaca user (dan untuk rehash), tidak selama verifikasi hash
 def authenticate_user(no_hp, password):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    with db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute('SELECT * FROM "user" WHERE no_hp = %s;', (no_hp,))
+            user = cur.fetchone()
 
-    cur.execute('SELECT * FROM "user" WHERE no_hp = %s;', (no_hp,))
-    user = cur.fetchone()
+    if not user:
+        global _DUMMY_HASH
+        if _DUMMY_HASH is None:
+            _DUMMY_HASH = hash_password('dummy-password')
+        verify_password_bounded(password, _DUMMY_HASH)
 
-    if user and user['password'] == password:
-        # Mencatat login dengan timestamp
+    if user and verify_password_bounded(password, user['password']):
+        # Riwayat login dicatat di login_audit oleh route, jadi login tidak menulis ke tabel "user"
         timestamp = datetime.now()
         log = f"Login successful: {timestamp}"
-        
-        # Memperbarui log di database
-        cur.execute('''
-            UPDATE "user" SET log = %s, timestamp = %s WHERE id = %s;
-        ''', (log, timestamp, user['id']))
-        conn.commit()
+
+        # Hash lama (parameter biaya lama atau masih plaintext) diganti dengan hash versi terbaru
+        if needs_rehash(user['password']):
+            user['password'] = hash_password_bounded(password)
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute('UPDATE "user" SET password = %s WHERE id = %s;', (user['password'], user['id']))
 
         # Menambahkan log dan timestamp ke dalam objek user
         user['log'] = log
         user['timestamp'] = timestamp
 
-        cur.close()
-        conn.close()
         return user
     else:
-        cur.close()
-        conn.close()
         return None
+
+# Migrasi sekali jalan: hash semua password yang masih plaintext (dipanggil dari manage.py hash-passwords)
+def hash_plaintext_passwords(batch_size=200):
+    conn = get_db()
+    cur = conn.cursor()
+    last_id = 0
+    total = 0
+    while True:
+        cur.execute('''
+            SELECT id, password FROM "user"
+            WHERE id > %s AND password IS NOT NULL AND password NOT LIKE %s
+            ORDER BY id LIMIT %s;
+        ''', (last_id, PREFIX + '$%', batch_size))
+        rows = cur.fetchall()
+        if not rows:
+            break
+        execute_batch(cur, 'UPDATE "user" SET password = %s WHERE id = %s;',
+                      [(hash_password(password), user_id) for user_id, password in rows])
+        conn.commit()
+        last_id = rows[-1][0]
+        total += len(rows)
+    cur.close()
+    return total
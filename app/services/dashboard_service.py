@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+
+from app.utils.db import get_db, db_connection
+from app.utils.pagination import fetch_page
+from app.utils.metrics import register_metrics
+from config import Config
+from psycopg2.extras import RealDictCursor
+
+logger = logging.getLogger(__name__)
+
+# Statistik dashboard disimpan per UMKM di tabel umkm_statistik. Jalur tulis produk memanggil fungsi
+# record_*/refresh_* di bawah dalam transaksi yang sama, dan hanya mengunci baris UMKM tersebut.
+# Total global dibaca dari materialized view dashboard_statistik (satu baris) yang di-refresh setiap
+# DASHBOARD_REFRESH_INTERVAL detik, sehingga tidak ada baris yang dikunci semua penulis dan membaca
+# total tidak perlu menjumlahkan semua UMKM. Baris umkm_statistik ikut terhapus (ON DELETE CASCADE)
+# saat UMKM atau user pemiliknya dihapus.
+
+# Kunci advisory agar hanya satu worker yang me-refresh dalam satu waktu
+_REFRESH_LOCK_ID = 7416002
+
+# Statistik produk per UMKM, per halaman (keyset pada id UMKM); UMKM yang belum punya produk tetap
+# muncul dengan angka 0
+def fetch_umkm_statistik_page(page):
+    return fetch_page('''
+        SELECT u.id, u.nama,
+               COALESCE(s.produk_all, 0) AS produk_all,
+               COALESCE(s.produk_publish, 0) AS produk_publish,
+               COALESCE(s.produk_all - s.produk_publish, 0) AS produk_unpublish
+        FROM umkm u
+        LEFT JOIN umkm_statistik s ON s.id_umkm = u.id
+    ''', [], [], page)
+
+# updated_at adalah waktu refresh terakhir dashboard_statistik, bukan waktu baca
+def get_total_statistik():
+    get_dashboard_refresher()
+    cur = get_db().cursor(cursor_factory=RealDictCursor)
+    cur.execute('''
+        SELECT total_umkm, total_umkm_aktif, total_produk, total_publish,
+               total_produk - total_publish AS total_unpublish,
+               refreshed_at AS updated_at
+        FROM dashboard_statistik WHERE id;
+    ''')
+    total = cur.fetchone()
+    cur.close()
+    return total
+
+# Hitung ulang total global jika refresh terakhir sudah lebih lama dari max_age detik. Worker lain yang
+# bersamaan menunggu kunci lalu melihat data sudah segar, jadi refresh tidak dijalankan berulang.
+# Mengembalikan True jika refresh benar-benar dijalankan.
+def refresh_dashboard_statistik(max_age=0):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT pg_advisory_xact_lock(%s);', (_REFRESH_LOCK_ID,))
+            cur.execute('''
+                SELECT refreshed_at > now()::timestamp - make_interval(secs => %s) FROM dashboard_statistik WHERE id;
+            ''', (max_age,))
+            row = cur.fetchone()
+            if row and row[0]:
+                return False
+            cur.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY dashboard_statistik;')
+    return True
+
+
+# Thread latar belakang per worker yang me-refresh dashboard_statistik setiap DASHBOARD_REFRESH_INTERVAL
+class DashboardRefresher(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name='dashboard-refresher', daemon=True)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._stats = {'refreshes': 0, 'skipped': 0, 'failures': 0}
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                refreshed = refresh_dashboard_statistik(max_age=self.interval / 2)
+            except Exception:
+                logger.exception('Gagal me-refresh dashboard_statistik')
+                self._count('failures')
+                continue
+            self._count('refreshes' if refreshed else 'skipped')
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+_refresher = None
+_refresher_pid = None
+_refresher_lock = threading.Lock()
+
+
+# Refresher dibuat per worker (setelah fork) saat total dashboard pertama kali dibaca
+def get_dashboard_refresher():
+    global _refresher, _refresher_pid
+    if _refresher is None or _refresher_pid != os.getpid():
+        with _refresher_lock:
+            if _refresher is None or _refresher_pid != os.getpid():
+                _refresher = DashboardRefresher(Config.DASHBOARD_REFRESH_INTERVAL)
+                _refresher.start()
+                _refresher_pid = os.getpid()
+    return _refresher
+
+def record_produk_added(id_umkm, is_publik):
+    cur = get_db().cursor()
+    cur.execute('''
+        INSERT INTO umkm_statistik (id_umkm, produk_all, produk_publish) VALUES (%s, 1, %s)
+        ON CONFLICT (id_umkm) DO UPDATE
+        SET produk_all = umkm_statistik.produk_all + 1,
+            produk_publish = umkm_statistik.produk_publish + EXCLUDED.produk_publish,
+            updated_at = now();
+    ''', (id_umkm, 1 if is_publik else 0))
+    cur.close()
+
+# Hitung ulang ringkasan satu UMKM setelah banyak produknya berubah sekaligus (import produk)
+def refresh_umkm_statistik(id_umkm):
+    cur = get_db().cursor()
+    cur.execute('''
+        INSERT INTO umkm_statistik (id_umkm, produk_all, produk_publish)
+        SELECT %s, COUNT(*), COUNT(*) FILTER (WHERE is_publik)
+        FROM produk WHERE id_umkm = %s
+        ON CONFLICT (id_umkm) DO UPDATE
+        SET produk_all = EXCLUDED.produk_all,
+            produk_publish = EXCLUDED.produk_publish,
+            updated_at = now();
+    ''', (id_umkm, id_umkm))
+    cur.close()
+
+
+def dashboard_metrics():
+    if _refresher is None or _refresher_pid != os.getpid():
+        return {'running': False}
+    stats = _refresher.stats()
+    stats['running'] = _refresher.is_alive()
+    stats['interval'] = _refresher.interval
+    return stats
+
+
+register_metrics('dashboard', dashboard_metrics)
@@ -0,0 +1,290 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from config import Config
+from app.utils.db import connect_kwargs
+from app.utils.metrics import register_metrics
+
+# pyarrow opsional: tanpa pyarrow export CSV tetap tersedia, hanya Parquet yang tidak bisa
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_STATUSES = ('semua', 'aktif', 'nonaktif')
+EXPORT_FORMATS = ('csv', 'parquet')
+
+# (nama kolom, ekspresi SQL, tipe kolom Parquet). Satu baris per produk; UMKM tanpa produk tetap
+# muncul sekali dengan kolom produk kosong.
+EXPORT_COLUMNS = (
+    ('id_umkm', 'u.id', 'int32'),
+    ('id_user', 'u.id_user', 'int32'),
+    ('nama_umkm', 'u.nama', 'string'),
+    ('kategori', 'u.kategori', 'string'),
+    ('alamat', 'u.alamat', 'string'),
+    ('no_kontak', 'u.no_kontak', 'string'),
+    ('status_umkm', 'u.status_umkm', 'bool_'),
+    ('id_produk', 'p.id', 'int32'),
+    ('kode_produk', 'p.kode_produk', 'string'),
+    ('nama_produk', 'p.nama_produk', 'string'),
+    ('deskripsi', 'p.deskripsi', 'string'),
+    ('harga', 'p.harga', 'decimal128'),
+    ('masa_berlaku', 'p.masa_berlaku', 'date32'),
+    ('is_publik', 'p.is_publik', 'bool_'),
+)
+
+# harga (NUMERIC tanpa presisi tetap) di Parquet disimpan tepat sebagai decimal128 dengan presisi ini
+HARGA_PRECISION = 18
+HARGA_SCALE = 2
+
+_STATUS_CONDITIONS = {'semua': None, 'aktif': 'u.status_umkm', 'nonaktif': 'u.status_umkm = FALSE'}
+
+_slots = threading.BoundedSemaphore(Config.EXPORT_MAX_CONCURRENT)
+_stats = {'running': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'timed_out': 0, 'rejected': 0, 'bytes': 0,
+          'rows': 0}
+_stats_lock = threading.Lock()
+
+# Penanda akhir data di antrian chunk
+_DONE = object()
+
+
+class ExportBusy(Exception):
+    """Jumlah export yang berjalan sudah mencapai EXPORT_MAX_CONCURRENT."""
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _TimedOut(_Cancelled):
+    pass
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+# Parquet: harga di-cast ke numeric(HARGA_PRECISION, HARGA_SCALE) agar skema decimal128 sama di setiap
+# row group (nilai dengan lebih dari HARGA_SCALE desimal dibulatkan). CSV: boolean ditulis true/false,
+# bukan t/f bawaan COPY.
+def export_query(status='semua', parquet=False):
+    columns = []
+    for name, expression, arrow_type in EXPORT_COLUMNS:
+        if parquet and arrow_type == 'decimal128':
+            expression = f'{expression}::numeric({HARGA_PRECISION}, {HARGA_SCALE})'
+        elif not parquet and arrow_type == 'bool_':
+            expression += '::text'
+        columns.append(f'{expression} AS {name}')
+    query = f"SELECT {', '.join(columns)} FROM umkm u LEFT JOIN produk p ON p.id_umkm = u.id"
+    condition = _STATUS_CONDITIONS[status]
+    if condition:
+        query += f' WHERE {condition}'
+    return query + ' ORDER BY u.id, p.id'
+
+
+# Export memakai koneksi sendiri yang read-only (opsional ke replica), bukan koneksi pool/transaksi
+# request, sehingga export yang lama tidak menahan koneksi maupun transaksi di jalur utama.
+# timeout (detik) dipasang sebagai statement_timeout koneksi tersebut.
+def export_connection(autocommit=True, timeout=None):
+    options = {'options': f'-c statement_timeout={int(timeout * 1000)}'} if timeout else {}
+    if Config.EXPORT_DATABASE_DSN:
+        conn = psycopg2.connect(Config.EXPORT_DATABASE_DSN, **options)
+    else:
+        conn = psycopg2.connect(**connect_kwargs(), **options)
+    conn.set_session(readonly=True, autocommit=autocommit)
+    return conn
+
+
+@contextmanager
+def _export_slot():
+    if not _slots.acquire(blocking=False):
+        _count('rejected')
+        raise ExportBusy(f'Sudah ada {Config.EXPORT_MAX_CONCURRENT} export yang berjalan')
+    _count('running')
+    try:
+        yield
+    finally:
+        _count('running', -1)
+        _slots.release()
+
+
+def _copy_sql(status):
+    return f'COPY ({export_query(status)}) TO STDOUT WITH (FORMAT csv, HEADER)'
+
+
+# COPY langsung ke file (manage.py export). Satu statement dalam autocommit: tanpa transaksi terbuka.
+def copy_csv(fileobj, status='semua'):
+    with _export_slot():
+        conn = export_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(_copy_sql(status), fileobj, size=Config.EXPORT_CHUNK_SIZE)
+                _count('rows', max(cur.rowcount, 0))
+            _count('completed')
+        except Exception:
+            _count('failed')
+            raise
+        finally:
+            conn.close()
+
+
+# Target tulis COPY TO STDOUT: psycopg2 menulis per baris, dikumpulkan menjadi chunk EXPORT_CHUNK_SIZE
+# lalu dimasukkan ke antrian terbatas. Jika klien lambat, antrian penuh dan COPY ikut tertahan,
+# sehingga memori tetap sebesar EXPORT_QUEUE_SIZE chunk berapa pun ukuran datanya. Setelah deadline
+# (misal body response tidak pernah dibaca atau di-close) export dihentikan agar thread dan slot lepas.
+class _QueueWriter:
+    def __init__(self, chunks, cancelled, deadline):
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._deadline = deadline
+        self._buffer = bytearray()
+
+    def put(self, item):
+        while True:
+            if self._cancelled.is_set():
+                raise _Cancelled()
+            if time.monotonic() >= self._deadline:
+                raise _TimedOut()
+            try:
+                self._chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer += data
+        if len(self._buffer) >= Config.EXPORT_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            chunk, self._buffer = bytes(self._buffer), bytearray()
+            _count('bytes', len(chunk))
+            self.put(chunk)
+
+
+# Iterable untuk body response: COPY berjalan di thread terpisah dan chunk-nya diambil dari antrian.
+# close() (dipanggil server WSGI, termasuk saat klien memutus koneksi) menghentikan COPY di database.
+class CsvExportStream:
+    def __init__(self, status='semua'):
+        self._slot = _export_slot()
+        self._slot.__enter__()
+        try:
+            self._conn = export_connection(timeout=Config.EXPORT_TIMEOUT)
+        except Exception:
+            self._slot.__exit__(None, None, None)
+            raise
+        self._chunks = queue.Queue(maxsize=Config.EXPORT_QUEUE_SIZE)
+        self._cancelled = threading.Event()
+        self._writer = _QueueWriter(self._chunks, self._cancelled, time.monotonic() + Config.EXPORT_TIMEOUT)
+        self._thread = threading.Thread(target=self._run, args=(status,), name='csv-export', daemon=True)
+        self._thread.start()
+
+    def _run(self, status):
+        result = _DONE
+        try:
+            with self._conn.cursor() as cur:
+                cur.copy_expert(_copy_sql(status), self._writer, size=Config.EXPORT_CHUNK_SIZE)
+                _count('rows', max(cur.rowcount, 0))
+            self._writer.flush()
+            _count('completed')
+        except Exception as e:
+            if self._cancelled.is_set():
+                _count('cancelled')
+            elif isinstance(e, (_TimedOut, psycopg2.extensions.QueryCanceledError)):
+                _count('timed_out')
+                result = e
+            else:
+                _count('failed')
+                result = e
+        finally:
+            self._conn.close()
+            self._slot.__exit__(None, None, None)
+        try:
+            self._writer.put(result)
+        except _Cancelled:
+            pass
+
+    def __iter__(self):
+        while True:
+            item = self._chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self):
+        if self._thread.is_alive():
+            self._cancelled.set()
+            try:
+                self._conn.cancel()
+            except psycopg2.Error:
+                pass
+
+
+def _arrow_type(arrow_type):
+    if arrow_type == 'decimal128':
+        return pa.decimal128(HARGA_PRECISION, HARGA_SCALE)
+    return getattr(pa, arrow_type)()
+
+
+def _arrow_schema():
+    return pa.schema([(name, _arrow_type(arrow_type)) for name, _, arrow_type in EXPORT_COLUMNS])
+
+
+# Tulis export ke file Parquet per batch EXPORT_BATCH_SIZE baris (satu row group per batch) dari
+# server-side cursor, di dalam satu transaksi read-only pada koneksi export. File ditulis ke .tmp dulu
+# lalu di-rename, sehingga file di path tujuan selalu lengkap.
+def write_parquet(path, status='semua'):
+    if pa is None:
+        raise RuntimeError('Export Parquet membutuhkan pyarrow (pip install pyarrow)')
+
+    schema = _arrow_schema()
+    names = [name for name, _, _ in EXPORT_COLUMNS]
+    tmp_path = f'{path}.tmp'
+    total = 0
+    with _export_slot():
+        conn = export_connection(autocommit=False)
+        try:
+            cur = conn.cursor(name='parquet_export')
+            cur.itersize = Config.EXPORT_BATCH_SIZE
+            cur.execute(export_query(status, parquet=True))
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                while True:
+                    rows = cur.fetchmany(Config.EXPORT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+                    writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                    total += len(rows)
+            cur.close()
+            os.replace(tmp_path, path)
+            _count('rows', total)
+            _count('completed')
+        except Exception:
+            _count('failed')
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            conn.close()
+    return total
+
+
+def export_metrics():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['max_concurrent'] = Config.EXPORT_MAX_CONCURRENT
+    return stats
+
+
+register_metrics('export', export_metrics)
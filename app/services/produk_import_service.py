@@ -0,0 +1,256 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from app.utils.db import get_db
+from app.utils.validation_utils import validate_date
+from app.services.dashboard_service import refresh_umkm_statistik
+from config import Config
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_COLUMNS = ('kode_produk', 'nama_produk', 'deskripsi', 'harga', 'masa_berlaku', 'is_publik')
+REQUIRED_COLUMNS = ('kode_produk', 'nama_produk')
+
+_TRUE = {'true', 't', '1', 'ya', 'yes', 'y'}
+_FALSE = {'false', 'f', '0', 'tidak', 'no', 'n', ''}
+
+
+class ImportFormatError(ValueError):
+    """File import tidak bisa dibaca (format, header, atau jumlah baris)."""
+
+
+# Tebak format dari ekstensi/jenis file jika tidak disebutkan
+def detect_format(filename, mimetype):
+    filename = (filename or '').lower()
+    if filename.endswith('.csv') or mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if filename.endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return None
+
+
+def _decode_lines(stream):
+    for index, line in enumerate(stream):
+        try:
+            text = line.decode('utf-8')
+        except UnicodeDecodeError:
+            raise ImportFormatError('File harus berupa teks UTF-8')
+        yield text.lstrip('\ufeff') if index == 0 else text
+
+
+# Setiap record berupa (nomor baris, dict kolom) atau (nomor baris, pesan error) jika tidak bisa dibaca.
+# Header CSV langsung diperiksa, sebelum ada baris yang dikirim ke database.
+def _csv_records(stream):
+    reader = csv.DictReader(_decode_lines(stream))
+    try:
+        header = reader.fieldnames or []
+    except csv.Error as e:
+        raise ImportFormatError(f'Header CSV tidak valid: {e}')
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ImportFormatError(f'Kolom wajib tidak ada di header CSV: {missing}')
+
+    def records():
+        while True:
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num, f'Baris CSV tidak valid: {e}'
+                continue
+            if not any((value or '').strip() for key, value in record.items() if key is not None):
+                continue
+            yield reader.line_num, record
+    return records()
+
+
+def _ndjson_records(stream):
+    for line_num, line in enumerate(_decode_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_num, 'Baris bukan JSON yang valid'
+            continue
+        if not isinstance(record, dict):
+            yield line_num, 'Setiap baris harus berupa objek JSON'
+            continue
+        yield line_num, record
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+# Validasi satu baris; kembalikan (baris untuk staging, daftar error)
+def validate_row(record):
+    errors = []
+    kode_produk = _text(record.get('kode_produk'))
+    nama_produk = _text(record.get('nama_produk'))
+    deskripsi = _text(record.get('deskripsi'))
+    harga = _text(record.get('harga'))
+    masa_berlaku = _text(record.get('masa_berlaku'))
+    is_publik = record.get('is_publik')
+
+    if not kode_produk:
+        errors.append('kode_produk harus diisi')
+    elif len(kode_produk) > 50:
+        errors.append('kode_produk maksimal 50 karakter')
+    if not nama_produk:
+        errors.append('nama_produk harus diisi')
+    elif len(nama_produk) > 255:
+        errors.append('nama_produk maksimal 255 karakter')
+
+    if harga is not None:
+        try:
+            harga = Decimal(harga)
+            if not harga.is_finite() or harga < 0:
+                raise InvalidOperation
+        except InvalidOperation:
+            errors.append('harga harus berupa angka >= 0')
+
+    if masa_berlaku is not None and not validate_date(masa_berlaku):
+        errors.append('masa_berlaku harus berformat YYYY-MM-DD')
+
+    if not isinstance(is_publik, bool):
+        text = (_text(is_publik) or '').lower()
+        if text in _TRUE:
+            is_publik = True
+        elif text in _FALSE:
+            is_publik = False
+        else:
+            errors.append('is_publik harus true atau false')
+
+    return (kode_produk, nama_produk, deskripsi, harga, masa_berlaku, is_publik), errors
+
+
+# Sumber data untuk COPY FROM STDIN: baris yang lolos validasi diubah ke CSV saat dibaca oleh psycopg2,
+# sehingga file dibaca, divalidasi dan dikirim ke database sebagai satu aliran tanpa ditampung di memori
+class _CopySource:
+    def __init__(self, records):
+        self._records = records
+        self._buffer = ''
+        self._writer_buffer = io.StringIO()
+        self._writer = csv.writer(self._writer_buffer)
+        self.total = 0
+        self.failed = 0
+        self.errors = []
+        self._seen = {}
+        # Error yang membatalkan seluruh import; dilempar setelah COPY selesai karena psycopg2
+        # membungkus exception dari read() menjadi QueryCanceled
+        self.error = None
+
+    def _error(self, line, kode_produk, messages):
+        self.failed += 1
+        if len(self.errors) < Config.PRODUK_IMPORT_MAX_ERRORS:
+            self.errors.append({'line': line, 'kode_produk': kode_produk, 'errors': messages})
+
+    def _next_line(self):
+        try:
+            return self._next_valid_line()
+        except ImportFormatError as e:
+            self.error = e
+            return None
+
+    def _next_valid_line(self):
+        for line, record in self._records:
+            self.total += 1
+            if self.total > Config.PRODUK_IMPORT_MAX_ROWS:
+                raise ImportFormatError(f'File berisi lebih dari {Config.PRODUK_IMPORT_MAX_ROWS} baris')
+            if isinstance(record, str):
+                self._error(line, None, [record])
+                continue
+            row, errors = validate_row(record)
+            kode_produk = row[0]
+            # Satu kode_produk hanya boleh muncul sekali per file (merge tidak bisa mengubah baris yang sama dua kali)
+            if kode_produk and kode_produk in self._seen:
+                errors.append(f'kode_produk ganda, sudah dipakai di baris {self._seen[kode_produk]}')
+            if errors:
+                self._error(line, kode_produk, errors)
+                continue
+            self._seen[kode_produk] = line
+            self._writer_buffer.seek(0)
+            self._writer_buffer.truncate()
+            self._writer.writerow((line,) + row)
+            return self._writer_buffer.getvalue()
+        return None
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = self._next_line()
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+# Import produk untuk satu UMKM: validasi per baris sambil di-COPY ke tabel staging sementara, lalu
+# digabung ke produk berdasarkan (id_umkm, kode_produk). Baris yang valid tetap disimpan walaupun
+# ada baris lain yang error. Kolom yang diimport menggantikan nilai lama; foto_produk tidak berubah.
+def import_produks(id_umkm, stream, file_format):
+    records = _csv_records(stream) if file_format == 'csv' else _ndjson_records(stream)
+    source = _CopySource(records)
+
+    cur = get_db().cursor()
+    cur.execute('''
+        CREATE TEMP TABLE produk_import (
+            line INTEGER NOT NULL,
+            kode_produk VARCHAR(50) NOT NULL,
+            nama_produk VARCHAR(255) NOT NULL,
+            deskripsi TEXT,
+            harga NUMERIC,
+            masa_berlaku DATE,
+            is_publik BOOLEAN NOT NULL
+        ) ON COMMIT DROP;
+    ''')
+    try:
+        cur.copy_expert(
+            f"COPY produk_import (line, {', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            source, size=Config.UPLOAD_CHUNK_SIZE
+        )
+        if source.error:
+            raise source.error
+        # xmax = 0 berarti baris baru hasil INSERT, selain itu baris lama yang di-UPDATE
+        cur.execute('''
+            /* full-scan */
+            WITH merged AS (
+                INSERT INTO produk (id_umkm, kode_produk, nama_produk, deskripsi, harga, masa_berlaku, is_publik)
+                SELECT %s, kode_produk, nama_produk, deskripsi, harga, masa_berlaku, is_publik
+                FROM produk_import ORDER BY line
+                ON CONFLICT (id_umkm, kode_produk) DO UPDATE
+                SET nama_produk = EXCLUDED.nama_produk,
+                    deskripsi = EXCLUDED.deskripsi,
+                    harga = EXCLUDED.harga,
+                    masa_berlaku = EXCLUDED.masa_berlaku,
+                    is_publik = EXCLUDED.is_publik
+                RETURNING xmax = 0 AS inserted
+            )
+            SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged;
+        ''', (id_umkm,))
+        inserted, updated = cur.fetchone()
+        cur.execute('DROP TABLE produk_import;')
+    finally:
+        cur.close()
+
+    if inserted or updated:
+        refresh_umkm_statistik(id_umkm)
+
+    return {
+        'summary': {
+            'total': source.total,
+            'inserted': inserted,
+            'updated': updated,
+            'failed': source.failed
+        },
+        'errors': source.errors,
+        'errors_truncated': source.failed > len(source.errors)
+    }
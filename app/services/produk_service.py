@@ -1,16 +1,17 @@
-from app.utils.db import get_db_connection
+from app.utils.db import get_db
+from app.utils.loaders import load_children
+from app.utils.thumbnails import upload_variants
+from app.utils.pagination import fetch_sorted_page
+from app.services.dashboard_service import record_produk_added
+from psycopg2.extras import RealDictCursor
 
 def add_produk(produk_data):
-    conn = get_db_connection()
-    cur = conn.cursor()
+    conn = get_db()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    # Log untuk mengecek id_umkm sebelum query
-    print(f"Checking existence of UMKM ID: {produk_data['id_umkm']}")
-    
     # Validasi id_umkm sebelum insert produk
     cur.execute('SELECT * FROM umkm WHERE id = %s;', (produk_data['id_umkm'],))
     if cur.fetchone() is None:
-        conn.close()
         return {"error": "UMKM ID tidak ditemukan"}, 404
 
     cur.execute('''
@@ -21,24 +22,57 @@ def add_produk(produk_data):
         produk_data['harga'], produk_data['masa_berlaku'], produk_data['foto_produk'], produk_data['is_publik']
     ))
     produk = cur.fetchone()
-    umkm_result = cur.fetchone()
-    print(f"Query Result for UMKM: {umkm_result}")
-    if umkm_result is None:
-        conn.close()
-        return {"error": "UMKM ID tidak ditemukan"}, 404
-
-    conn.commit()
     cur.close()
-    conn.close()
+    produk['foto_produk_variants'] = upload_variants(produk['foto_produk'])
+
+    # Ringkasan statistik dashboard ikut diperbarui dalam transaksi yang sama
+    record_produk_added(produk['id_umkm'], produk['is_publik'])
 
     return produk
 
-def get_all_produks():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT id, id_umkm, is_publik FROM produk')
-    produks = cur.fetchall()
-    cur.close()
-    conn.close()
-    
-    return [{"id": p[0], "id_umkm": p[1], "is_publik": p[2]} for p in produks]
+# Isi umkm['products'] untuk banyak UMKM sekaligus dengan satu query
+def attach_produks(umkms):
+    umkms = load_children(umkms, 'produk', 'id_umkm', 'products')
+    for umkm in umkms:
+        for produk in umkm['products']:
+            produk['foto_produk_variants'] = upload_variants(produk.get('foto_produk'))
+    return umkms
+
+# Kolom urut yang diizinkan untuk GET /produk. Ekspresi harus sama dengan index di migrasi 007.
+PRODUK_SORTS = {
+    'id': 'p.id',
+    'nama_produk': "COALESCE(p.nama_produk, '')",
+    'harga': 'COALESCE(p.harga, 0)',
+}
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Daftar produk dengan filter, urutan dan keyset pagination di SQL. Hanya kolom yang dipakai
+# endpoint yang diambil. Non-admin hanya melihat produk publik dari UMKM yang aktif.
+def list_produks(page, nama_produk=None, kategori=None, id_umkm=None, sort='id', descending=False, include_private=False):
+    sort_column = PRODUK_SORTS[sort]
+    base_query = f'''
+        SELECT p.id, p.id_umkm, p.kode_produk, p.nama_produk, p.harga, p.foto_produk, p.is_publik,
+               u.nama AS nama_umkm, u.kategori, {sort_column} AS sort_value
+        FROM produk p JOIN umkm u ON u.id = p.id_umkm
+    '''
+    conditions, params = [], []
+    if not include_private:
+        conditions.append('p.is_publik AND u.status_umkm')
+    if nama_produk:
+        conditions.append('p.nama_produk ILIKE %s')
+        params.append(f'%{_escape_like(nama_produk)}%')
+    if kategori:
+        conditions.append('lower(u.kategori) = lower(%s)')
+        params.append(kategori)
+    if id_umkm is not None:
+        conditions.append('p.id_umkm = %s')
+        params.append(id_umkm)
+
+    rows, next_cursor = fetch_sorted_page(base_query, conditions, params, page, sort_column, 'sort_value',
+                                          descending=descending, id_column='p.id')
+    for row in rows:
+        del row['sort_value']
+        row['foto_produk_variants'] = upload_variants(row['foto_produk'])
+    return rows, next_cursor
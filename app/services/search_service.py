@@ -0,0 +1,68 @@
+import re
+from app.utils.pagination import fetch_sorted_page
+from app.utils.thumbnails import upload_variants
+
+# Ekspresi tsvector harus sama persis dengan index GIN di migrations/008_search.sql
+PRODUK_VECTOR = '''(
+    setweight(to_tsvector('simple', COALESCE(p.nama_produk, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(p.deskripsi, '')), 'B')
+)'''
+
+UMKM_VECTOR = '''(
+    setweight(to_tsvector('simple', COALESCE(u.nama, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(u.kategori, '')), 'B') ||
+    setweight(to_tsvector('simple', COALESCE(u.alamat, '')), 'C')
+)'''
+
+SEARCH_TYPES = ('produk', 'umkm')
+
+MAX_SEARCH_TERMS = 8
+
+# "kopi bub" -> "kopi:* & bub:*": setiap kata dicocokkan sebagai prefix. None jika tidak ada kata.
+def build_prefix_query(q):
+    terms = re.findall(r'\w+', q.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return ' & '.join(f'{term}:*' for term in terms)
+
+# Hasil diurutkan berdasarkan relevansi (ts_rank + kemiripan trigram pada nama, untuk salah ketik)
+# dengan keyset pagination pada (rank, id)
+def search_produks(q, page, include_suspended=False):
+    tsquery = build_prefix_query(q)
+    conditions = [f'({PRODUK_VECTOR} @@ query OR %s <%% p.nama_produk)']
+    if not include_suspended:
+        conditions.append('p.is_publik AND u.status_umkm')
+    base_query = f'''
+        SELECT * FROM (
+            SELECT p.id, p.id_umkm, p.nama_produk, p.harga, p.foto_produk, u.nama AS nama_umkm, u.kategori,
+                   (ts_rank({PRODUK_VECTOR}, query) + word_similarity(%s, p.nama_produk))::float8 AS rank
+            FROM produk p JOIN umkm u ON u.id = p.id_umkm, to_tsquery('simple', %s) query
+            WHERE {' AND '.join(conditions)}
+        ) s
+    '''
+    rows, next_cursor = fetch_sorted_page(base_query, [], [q, tsquery, q], page, 'rank', 'rank',
+                                          descending=True, sort_type='float8')
+    for row in rows:
+        del row['rank']
+        row['foto_produk_variants'] = upload_variants(row['foto_produk'])
+    return rows, next_cursor
+
+def search_umkms(q, page, include_suspended=False):
+    tsquery = build_prefix_query(q)
+    conditions = [f'({UMKM_VECTOR} @@ query OR %s <%% u.nama)']
+    if not include_suspended:
+        conditions.append('u.status_umkm')
+    base_query = f'''
+        SELECT * FROM (
+            SELECT u.id, u.nama, u.kategori, u.alamat, u.foto_umkm, u.status_umkm,
+                   (ts_rank({UMKM_VECTOR}, query) + word_similarity(%s, u.nama))::float8 AS rank
+            FROM umkm u, to_tsquery('simple', %s) query
+            WHERE {' AND '.join(conditions)}
+        ) s
+    '''
+    rows, next_cursor = fetch_sorted_page(base_query, [], [q, tsquery, q], page, 'rank', 'rank',
+                                          descending=True, sort_type='float8')
+    for row in rows:
+        del row['rank']
+        row['foto_umkm_variants'] = upload_variants(row['foto_umkm'])
+    return rows, next_cursor
@@ -1,47 +1,14 @@
-from app.utils.db import get_db_connection
-from functools import wraps
+from app.utils.db import get_db
+from app.utils.invalidation import publish_invalidation
+from app.middlewares.umkm_middleware import resolve_umkm
+from app.utils.pagination import fetch_page
+from app.utils.streaming import iter_rows
+from app.utils.uploads import release_uploads
+from app.utils.thumbnails import upload_variants
 from psycopg2.extras import RealDictCursor
-from flask import g, jsonify
-
-def get_missing_id(table_name, id_column):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    query = f"""
-    SELECT t1.{id_column} + 1 as missing_id
-    FROM {table_name} t1
-    LEFT JOIN {table_name} t2 ON t1.{id_column} + 1 = t2.{id_column}
-    WHERE t2.{id_column} IS NULL
-    ORDER BY t1.{id_column}
-    LIMIT 1;
-    """
-    cur.execute(query)
-    result = cur.fetchone()
-    cur.close()
-    conn.close()
-    if result:
-        return result[0]
-    else:
-        return None
-
-def get_umkms():
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute('SELECT id, nama, status_umkm FROM umkm')
-    umkms = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    result = []
-    for umkm in umkms:
-        if umkm[2]:  # status_umkm adalah True
-            result.append({"id": umkm[0], "nama": umkm[1]})
-        else:  # status_umkm adalah False
-            result.append({"data umkm dengan id: {} telah di suspended".format(umkm[0])})
-    
-    return result
 
 def get_umkm_detail(umkm_id, user_role):
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor()
 
     cur.execute('SELECT * FROM umkm WHERE id = %s;', (umkm_id,))
@@ -49,14 +16,12 @@ def get_umkm_detail(umkm_id, user_role):
 
     if not umkm:
         cur.close()
-        conn.close()
         return {"error": "UMKM not found"}, 404
 
     # Periksa status UMKM
     status_umkm = umkm[11]
     if not status_umkm and user_role != 'ADMIN':
         cur.close()
-        conn.close()
         return {"error": "This UMKM is suspended and cannot be accessed by users."}, 403
 
     cur.execute('SELECT * FROM produk WHERE id_umkm = %s;', (umkm_id,))
@@ -73,83 +38,82 @@ def get_umkm_detail(umkm_id, user_role):
         "npwp": umkm[7],
         "jam_buka": umkm[8],
         "foto_umkm": umkm[9],
+        "foto_umkm_variants": upload_variants(umkm[9]),
         "dokumen": umkm[10],
         "status_umkm": umkm[11],
         "products": [{"id": product[0], "nama_produk": product[1], "harga": product[2]} for product in products]
     }
 
     cur.close()
-    conn.close()
     return umkm_detail
 
 def update_umkm_by_id(umkm_id, data, user_role, user_id):
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor()
     
-    cur.execute('SELECT id_user, status_umkm FROM umkm WHERE id = %s;', (umkm_id,))
-    umkm = cur.fetchone()
+    # Baris UMKM yang sudah diambil middleware policy dipakai ulang, tanpa query tambahan
+    umkm = resolve_umkm(umkm_id)
 
     if not umkm:
         cur.close()
-        conn.close()
         return {"error": "UMKM not found"}, 404
 
-    if umkm[0] != user_id and user_role != 'ADMIN':
+    if umkm['id_user'] != user_id and user_role != 'ADMIN':
         cur.close()
-        conn.close()
         return {"error": "You can only update your own UMKM."}, 403
 
-    if not umkm[1] and user_role != 'ADMIN':
+    if not umkm['status_umkm'] and user_role != 'ADMIN':
         cur.close()
-        conn.close()
         return {"error": "This UMKM is suspended and cannot be updated by users."}, 403
 
     # Set status_umkm ke True by default jika user bukan admin
     if 'status_umkm' not in data or user_role == 'pemilik':
         data['status_umkm'] = True
 
+    # Nilai foto_umkm/dokumen lama dikembalikan agar upload yang diganti bisa dilepas
     query = '''
-        UPDATE umkm 
+        UPDATE umkm u
         SET nama = %s, kategori = %s, deskripsi = %s, alamat = %s, no_kontak = %s, npwp = %s, jam_buka = %s, 
             foto_umkm = %s, dokumen = %s, status_umkm = %s
-        WHERE id = %s;
+        FROM (SELECT id, foto_umkm, dokumen FROM umkm WHERE id = %s FOR UPDATE) old
+        WHERE u.id = old.id
+        RETURNING old.foto_umkm, old.dokumen;
     '''
     cur.execute(query, (
         data['nama'], data['kategori'], data['deskripsi'], data['alamat'], data['no_kontak'],
         data['npwp'], data['jam_buka'], data.get('foto_umkm'), data.get('dokumen'), data['status_umkm'], umkm_id
     ))
-    conn.commit()
+    old = cur.fetchone()
     cur.close()
-    conn.close()
+    if old:
+        release_uploads([key for key, new in zip(old, (data.get('foto_umkm'), data.get('dokumen'))) if key != new])
+    publish_invalidation('umkm', umkm_id)
 
     return {"message": "UMKM updated successfully."}, 200
 
 def delete_umkm_by_id(umkm_id, user_role, user_id):
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor()
 
-    cur.execute('SELECT id_user, status_umkm FROM umkm WHERE id = %s;', (umkm_id,))
-    umkm = cur.fetchone()
+    # Baris UMKM yang sudah diambil middleware policy dipakai ulang, tanpa query tambahan
+    umkm = resolve_umkm(umkm_id)
 
     if not umkm:
         cur.close()
-        conn.close()
         return {"error": "UMKM not found"}, 404
 
-    if umkm[0] != user_id and user_role != 'ADMIN':
+    if umkm['id_user'] != user_id and user_role != 'ADMIN':
         cur.close()
-        conn.close()
         return {"error": "You can only delete your own UMKM."}, 403
 
-    if not umkm[1] and user_role != 'ADMIN':
+    if not umkm['status_umkm'] and user_role != 'ADMIN':
         cur.close()
-        conn.close()
         return {"error": "This UMKM is suspended and cannot be deleted by users."}, 403
 
+    release_umkm_uploads([int(umkm_id)])
     cur.execute('DELETE FROM umkm WHERE id = %s;', (umkm_id,))
-    conn.commit()
     cur.close()
-    conn.close()
+    publish_invalidation('umkm', umkm_id)
 
     return {"message": "UMKM deleted successfully."}, 200
 
@@ -157,7 +121,7 @@ def create_umkm(data, user_id):
     if data['id_user'] != user_id:
         return {"error": "You can only create UMKM for yourself."}, 403
 
-    conn = get_db_connection()
+    conn = get_db()
     cur = conn.cursor()
 
     query = '''
@@ -170,57 +134,39 @@ def create_umkm(data, user_id):
     ))
 
     umkm = cur.fetchone()
-    conn.commit()
     cur.close()
-    conn.close()
 
     return umkm, 201
 
-def umkm_suspended_check(func):
-    @wraps(func)
-    def decorated_function(*args, **kwargs):
-        if g.user['role'] == 'admin':
-            return func(*args, **kwargs)
-
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        umkm_id = kwargs.get('umkm_id')
-        if umkm_id:
-            cur.execute('SELECT status_umkm FROM umkm WHERE id = %s;', (umkm_id,))
-            umkm = cur.fetchone()
-            
-            if umkm and not umkm['status_umkm']:
-                cur.close()
-                conn.close()
-                return jsonify({"error": "Akses ditolak. UMKM sedang di suspend."}), 403
-        
-        cur.close()
-        conn.close()
-        return func(*args, **kwargs)
-    
-    return decorated_function
+def fetch_all_umkm(page):
+    return fetch_page('SELECT * FROM umkm', [], [], page)
 
-def fetch_all_umkm():
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    cur.execute('SELECT * FROM umkm;')
-    umkms = cur.fetchall()
-    
-    cur.close()
-    conn.close()
-    
-    return umkms
+def fetch_umkm_by_user_id(user_id, page):
+    return fetch_page('SELECT * FROM umkm', ['id_user = %s'], [user_id], page)
 
-def fetch_umkm_by_user_id(user_id):
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
-    cur.execute('SELECT * FROM umkm WHERE id_user = %s;', (user_id,))
-    umkms = cur.fetchall()
-    
-    cur.close()
-    conn.close()
+def fetch_nonaktif_umkm(page, user_id=None):
+    if user_id is None:
+        return fetch_page('SELECT * FROM umkm', ['status_umkm = FALSE'], [], page)
+    return fetch_page('SELECT * FROM umkm', ['id_user = %s', 'status_umkm = FALSE'], [user_id], page)
+
+# Versi streaming: generator batch baris untuk seluruh hasil, tanpa batas halaman
+def iter_all_umkm():
+    return iter_rows('SELECT * FROM umkm', [], [])
+
+def iter_nonaktif_umkm(user_id=None):
+    if user_id is None:
+        return iter_rows('SELECT * FROM umkm', ['status_umkm = FALSE'], [])
+    return iter_rows('SELECT * FROM umkm', ['id_user = %s', 'status_umkm = FALSE'], [user_id])
 
-    return umkms
\ No newline at end of file
+# Lepaskan upload milik UMKM (foto, dokumen) dan foto produknya. Dipanggil sebelum UMKM dihapus.
+def release_umkm_uploads(umkm_ids):
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute('''
+        SELECT unnest(ARRAY[foto_umkm, dokumen]) FROM umkm WHERE id = ANY(%s)
+        UNION ALL
+        SELECT foto_produk FROM produk WHERE id_umkm = ANY(%s);
+    ''', (umkm_ids, umkm_ids))
+    keys = [row[0] for row in cur.fetchall()]
+    cur.close()
+    release_uploads(keys)
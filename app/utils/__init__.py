@@ -1,5 +1,5 @@
 # This file is used to make the utils module a package.
 
-from .db import get_db_connection
+from .db import get_db_connection, db_connection, get_db, get_pool
 from .jwt_utils import encode_token, decode_token
 from .validation_utils import validate_date
\ No newline at end of file
@@ -0,0 +1,137 @@
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+from config import Config
+from app.utils.db import get_pool
+from app.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ('user_id', 'no_hp', 'event', 'success', 'ip_address', 'user_agent', 'created_at')
+
+
+# Event login ditampung di memori lalu ditulis per batch oleh thread latar belakang ke tabel
+# append-only login_audit, sehingga request login tidak membuka transaksi tulis sendiri
+class AuditWriter(threading.Thread):
+    def __init__(self, flush_interval, batch_size, max_buffer):
+        super().__init__(name='login-audit-writer', daemon=True)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # Jika database tidak bisa ditulis terlalu lama, event tertua dibuang agar memori tidak habis
+        self._buffer = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._stats = {'recorded': 0, 'written': 0, 'dropped': 0, 'flushes': 0, 'failures': 0}
+
+    def record(self, event):
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._stats['dropped'] += 1
+            self._buffer.append(event)
+            self._stats['recorded'] += 1
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                if not batch:
+                    return
+                try:
+                    self._write(batch)
+                except Exception:
+                    logger.exception('Gagal menulis %d event login_audit', len(batch))
+                    with self._lock:
+                        self._stats['failures'] += 1
+                        # Dikembalikan ke depan antrian untuk dicoba lagi pada flush berikutnya. Batch ini
+                        # lebih tua dari isi buffer, jadi jika tidak muat, event tertua batch yang dibuang.
+                        room = self._buffer.maxlen - len(self._buffer)
+                        if room < len(batch):
+                            self._stats['dropped'] += len(batch) - room
+                            batch = batch[len(batch) - room:]
+                        self._buffer.extendleft(reversed(batch))
+                    return
+                with self._lock:
+                    self._stats['written'] += len(batch)
+                    self._stats['flushes'] += 1
+
+    def _write(self, batch):
+        with get_pool().getconn() as conn:
+            with conn.cursor() as cur:
+                execute_values(cur, f'INSERT INTO login_audit ({", ".join(_COLUMNS)}) VALUES %s;',
+                               [tuple(event[column] for column in _COLUMNS) for event in batch],
+                               page_size=self.batch_size)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._buffer)
+        return stats
+
+
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+# Writer dibuat per worker (setelah fork) saat event pertama dicatat
+def get_audit_writer():
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = AuditWriter(Config.AUDIT_FLUSH_INTERVAL, Config.AUDIT_BATCH_SIZE, Config.AUDIT_MAX_BUFFER)
+                _writer.start()
+                _writer_pid = os.getpid()
+    return _writer
+
+
+def record_login_event(event, success, user_id=None, no_hp=None, ip_address=None, user_agent=None, created_at=None):
+    get_audit_writer().record({
+        'user_id': user_id,
+        'no_hp': no_hp,
+        'event': event,
+        'success': success,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'created_at': created_at or datetime.now(),
+    })
+
+
+# Event yang belum tertulis di-flush saat proses berhenti
+@atexit.register
+def flush_audit_log():
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.stop()
+
+
+def audit_metrics():
+    if _writer is None or _writer_pid != os.getpid():
+        return {'pending': 0}
+    stats = _writer.stats()
+    stats['running'] = _writer.is_alive()
+    return stats
+
+
+register_metrics('login_audit', audit_metrics)
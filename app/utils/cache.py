@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Penanda "tidak ada di cache", karena None bisa jadi nilai yang sah
+MISSING = object()
+
+
+# Cache LRU dengan batas ukuran dan masa berlaku (TTL) per entri, aman dipakai antar thread
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                       'stale_fills': 0}
+        # Naik setiap invalidate()/clear(), untuk menolak pengisian dari data yang dibaca sebelum invalidasi
+        self._generation = 0
+
+    def get(self, key, default=MISSING):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    # generation: nilai generation() sebelum data dibaca dari database. Jika sudah ada invalidasi
+    # sejak itu, data tersebut mungkin sudah basi dan tidak disimpan.
+    def set(self, key, value, ttl=None, generation=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stats['stale_fills'] += 1
+                return
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._data.pop(key, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._data)
+        stats['maxsize'] = self.maxsize
+        stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
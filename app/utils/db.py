@@ -1,13 +1,268 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import pool as pg_pool
 from psycopg2.extras import RealDictCursor
+from flask import g
 from config import Config
+from app.utils.metrics import register_metrics
+
+
+class PoolTimeoutError(Exception):
+    """Tidak ada koneksi database yang kosong dalam batas waktu tunggu pool."""
+
+
+# Bungkus koneksi psycopg2 agar close() mengembalikan koneksi ke pool, bukan memutusnya
+class PooledConnection:
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+    # Jaring pengaman: koneksi yang lupa di-close tetap kembali ke pool saat objeknya dibuang
+    def __del__(self):
+        if getattr(self, '_conn', None) is not None:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        finally:
+            self.close()
+
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, timeout, health_check_interval, **connect_kwargs):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **connect_kwargs)
+        # Semaphore membatasi checkout sehingga request menunggu, bukan langsung PoolError
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.RLock()
+        self._last_used = {}
+        self._in_use = 0
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'checkout_latency_total': 0.0,
+            'checkout_latency_max': 0.0,
+        }
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeoutError(f'Pool koneksi penuh ({self.maxconn} koneksi dipakai)')
+        waited = time.monotonic() - start
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        latency = time.monotonic() - start
+        with self._lock:
+            self._in_use += 1
+            stats = self._stats
+            stats['checkouts'] += 1
+            stats['wait_time_total'] += waited
+            stats['wait_time_max'] = max(stats['wait_time_max'], waited)
+            stats['checkout_latency_total'] += latency
+            stats['checkout_latency_max'] = max(stats['checkout_latency_max'], latency)
+        return PooledConnection(self, conn)
+
+    def putconn(self, conn):
+        discard = bool(conn.closed)
+        if not discard and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # Transaksi yang tidak di-commit oleh pemanggil dibatalkan sebelum koneksi dipakai ulang
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._lock:
+            self._in_use -= 1
+            if discard:
+                self._last_used.pop(id(conn), None)
+                self._stats['discarded'] += 1
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=discard)
+        finally:
+            self._slots.release()
+
+    def _checkout_healthy(self):
+        conn = self._pool.getconn()
+        last_used = self._last_used.get(id(conn))
+        stale = last_used is not None and time.monotonic() - last_used > self.health_check_interval
+        if conn.closed or (stale and not self._ping(conn)):
+            with self._lock:
+                self._last_used.pop(id(conn), None)
+                self._stats['discarded'] += 1
+            self._pool.putconn(conn, close=True)
+            conn = self._pool.getconn()
+        return conn
+
+    # Health check hanya untuk koneksi yang lama menganggur, agar checkout biasa tetap tanpa round trip
+    def _ping(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1;')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            in_use = self._in_use
+            # ThreadedConnectionPool menyimpan koneksi menganggur di atribut _pool
+            idle = len(self._pool._pool)
+        checkouts = stats['checkouts'] or 1
+        stats.update({
+            'max_size': self.maxconn,
+            'in_use': in_use,
+            'idle': idle,
+            'wait_time_avg': stats['wait_time_total'] / checkouts,
+            'checkout_latency_avg': stats['checkout_latency_total'] / checkouts,
+        })
+        return stats
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def connect_kwargs():
+    return {key: value for key, value in Config.DATABASE.items() if not key.startswith('pool_')}
+
+
+# Pool dibuat per proses, karena koneksi tidak boleh dibagi antar worker hasil fork
+def get_pool():
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(
+                    Config.DATABASE.get('pool_min', 1),
+                    Config.DATABASE.get('pool_max', 10),
+                    Config.DATABASE.get('pool_timeout', 5),
+                    Config.DATABASE.get('pool_health_check_interval', 30),
+                    **connect_kwargs()
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
+
 
 # Function databaase connection
 def get_db_connection():
-    conn = psycopg2.connect(
-        dbname='umkm',
-        user='postgres',
-        password='artha',
-        host='localhost'
-    )
-    return conn
+    return get_pool().getconn()
+
+
+# Checkout koneksi dari pool: commit jika sukses, rollback jika error, lalu dikembalikan ke pool
+@contextmanager
+def db_connection():
+    with get_db_connection() as conn:
+        yield conn
+
+
+# Koneksi bersama untuk satu request: diambil saat pertama dipakai, lalu dipakai semua layer
+# (middleware, service, route). Commit/rollback dilakukan sekali di akhir request.
+def get_db():
+    if 'db_conn' not in g:
+        g.db_conn = get_db_connection()
+    return g.db_conn
+
+
+# Selesaikan transaksi request lebih awal dan kembalikan koneksinya ke pool, sebelum menunggu pekerjaan
+# lama yang tidak butuh database (misal hash password). get_db() berikutnya mengambil koneksi baru.
+def release_db():
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.commit()
+        conn.close()
+
+
+# Daftarkan fungsi yang baru boleh jalan setelah transaksi request berhasil di-commit
+# (misal invalidasi cache), agar request lain tidak sempat membaca data lama lalu menyimpannya lagi
+def call_after_commit(func, *args, **kwargs):
+    if 'db_after_commit' not in g:
+        g.db_after_commit = []
+    g.db_after_commit.append((func, args, kwargs))
+
+
+# Commit dijalankan sebelum response dikirim, agar kegagalan commit tetap jadi error 500
+def _finish_request_transaction(response):
+    conn = g.get('db_conn')
+    callbacks = g.pop('db_after_commit', [])
+    if conn is not None and not conn.closed:
+        if response.status_code < 400:
+            conn.commit()
+        else:
+            conn.rollback()
+            callbacks = []
+    for func, args, kwargs in callbacks:
+        func(*args, **kwargs)
+    return response
+
+
+def _release_request_connection(exc=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        # close() membatalkan transaksi yang belum selesai (misal karena exception) sebelum kembali ke pool
+        conn.close()
+
+
+def init_app(app):
+    app.after_request(_finish_request_transaction)
+    # teardown_appcontext juga berjalan untuk app_context() di luar request (misal perintah manage.py)
+    app.teardown_appcontext(_release_request_connection)
+
+
+def pool_metrics():
+    if _pool is None or _pool_pid != os.getpid():
+        return {'max_size': Config.DATABASE.get('pool_max', 10), 'in_use': 0, 'idle': 0}
+    return _pool.stats()
+
+
+register_metrics('db_pool', pool_metrics)
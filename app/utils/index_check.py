@@ -0,0 +1,146 @@
+import ast
+import json
+import os
+import re
+
+from app.utils.db import db_connection
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services')
+
+# Query yang tidak bisa di-EXPLAIN saat pengecekan (misal membaca tabel sementara yang baru dibuat
+# di transaksi yang sama) ditandai dengan komentar ini
+FULL_SCAN_MARKER = '/* full-scan */'
+
+_SQL_START = re.compile(r'^\s*(?:/\*.*?\*/\s*)?(SELECT|WITH|UPDATE|DELETE|INSERT)\b', re.IGNORECASE)
+_PAGE_HELPERS = {'fetch_page', 'iter_rows'}
+
+
+def _literal(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def _call_name(node):
+    func = node.func
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    if isinstance(func, ast.Name):
+        return func.id
+    return None
+
+
+# Susun ulang query fetch_page/iter_rows(base, [kondisi], params) seperti di app/utils/pagination.py
+def _page_query(node):
+    base = _literal(node.args[0]) if node.args else None
+    if base is None or len(node.args) < 2 or not isinstance(node.args[1], ast.List):
+        return None
+    conditions = [_literal(item) for item in node.args[1].elts]
+    if None in conditions:
+        return None
+    key = 'id'
+    for keyword in node.keywords:
+        if keyword.arg == 'key' and _literal(keyword.value):
+            key = keyword.value.value
+    query = base
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    return query + f' ORDER BY {key} LIMIT %s'
+
+
+# Pasangkan setiap pemanggilan dengan variabel string di fungsinya (query = '''...'''; cur.execute(query, ...))
+def _calls(tree):
+    functions = [node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
+    for function in functions:
+        assigned = {}
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                value = _literal(node.value)
+                if value is not None:
+                    assigned[node.targets[0].id] = value
+        for node in ast.walk(function):
+            if isinstance(node, ast.Call) and node.args:
+                yield node, assigned
+
+
+# Kumpulkan query SQL literal dari cur.execute(...) dan fetch_page/iter_rows(...) di app/services.
+# Query yang disusun dengan f-string tidak bisa dicek secara statis dan dilewati.
+def collect_queries(directory=SERVICES_DIR):
+    queries = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.py'):
+            continue
+        path = os.path.join(directory, filename)
+        with open(path) as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node, assigned in _calls(tree):
+            name = _call_name(node)
+            if name == 'execute':
+                query = _literal(node.args[0])
+                if query is None and isinstance(node.args[0], ast.Name):
+                    query = assigned.get(node.args[0].id)
+            elif name in _PAGE_HELPERS:
+                query = _page_query(node)
+            else:
+                continue
+            if query and _SQL_START.match(query):
+                queries.append((f'{filename}:{node.lineno}', query))
+    return queries
+
+
+def _to_prepared(query):
+    count = 0
+
+    def placeholder(match):
+        nonlocal count
+        count += 1
+        return f'${count}'
+
+    query = re.sub(r'%s', placeholder, query).replace('%%', '%')
+    return query.strip().rstrip(';'), count
+
+
+def _seq_scans(plan):
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+# Setiap query di-PREPARE dan di-EXPLAIN dengan generic plan (nilai parameter tidak diketahui) serta
+# enable_seqscan=off: jika planner tetap memilih Seq Scan, berarti tidak ada index yang bisa dipakai.
+# Tidak ada query yang benar-benar dijalankan, dan semuanya di-rollback.
+def check_queries(queries):
+    results = []
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('SET LOCAL enable_seqscan = off;')
+        cur.execute('SET LOCAL plan_cache_mode = force_generic_plan;')
+        for index, (location, query) in enumerate(queries):
+            if FULL_SCAN_MARKER in query:
+                results.append((location, query, 'exempt', None))
+                continue
+            statement, count = _to_prepared(query)
+            cur.execute('SAVEPOINT index_check;')
+            try:
+                cur.execute(f'PREPARE index_check_{index} AS {statement};')
+                args = ', '.join(['NULL'] * count)
+                cur.execute(f"EXPLAIN (FORMAT JSON) EXECUTE index_check_{index}{f'({args})' if count else ''};")
+                plan = cur.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = _seq_scans(plan[0]['Plan'])
+                if scans:
+                    results.append((location, query, 'seq_scan', ', '.join(sorted(set(filter(None, scans))))))
+                else:
+                    results.append((location, query, 'ok', None))
+                cur.execute(f'DEALLOCATE index_check_{index};')
+                cur.execute('RELEASE SAVEPOINT index_check;')
+            except Exception as e:
+                cur.execute('ROLLBACK TO SAVEPOINT index_check;')
+                results.append((location, query, 'error', str(e).strip().splitlines()[0]))
+        cur.close()
+        conn.rollback()
+    return results
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import select
+import threading
+
+import psycopg2
+from config import Config
+from app.utils.db import get_db, call_after_commit, connect_kwargs
+from app.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'cache_invalidation'
+
+_handlers = {}
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+_stats = {'published': 0, 'received': 0, 'reconnects': 0}
+
+
+# handler(key) dipanggil untuk setiap invalidasi; key None berarti seluruh cache harus dikosongkan
+def register_invalidation_handler(kind, handler):
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def _dispatch(kind, key):
+    for handler in _handlers.get(kind, []):
+        try:
+            handler(key)
+        except Exception:
+            logger.exception('Gagal menjalankan handler invalidasi %s', kind)
+
+
+# Kirim invalidasi ke semua worker. pg_notify ikut transaksi request, jadi hanya terkirim jika commit berhasil.
+def publish_invalidation(kind, key):
+    cur = get_db().cursor()
+    cur.execute('SELECT pg_notify(%s, %s);', (CHANNEL, json.dumps({'kind': kind, 'key': key})))
+    cur.close()
+    _stats['published'] += 1
+    # Worker ini langsung membuang cache-nya sendiri tanpa menunggu notifikasi kembali
+    call_after_commit(_dispatch, kind, key)
+
+
+class InvalidationListener(threading.Thread):
+    def __init__(self, poll_interval=5, retry_interval=5):
+        super().__init__(name='cache-invalidation-listener', daemon=True)
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**connect_kwargs())
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {CHANNEL};')
+                # Notifikasi selama koneksi terputus bisa hilang, jadi semua cache dikosongkan
+                for kind in list(_handlers):
+                    _dispatch(kind, None)
+                self._listen(conn)
+            except psycopg2.Error as e:
+                _stats['reconnects'] += 1
+                logger.warning('Listener invalidasi cache terputus: %s', e)
+                self._stop_event.wait(self.retry_interval)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _listen(self, conn):
+        while not self._stop_event.is_set():
+            if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    payload = json.loads(notify.payload)
+                except ValueError:
+                    continue
+                _stats['received'] += 1
+                _dispatch(payload.get('kind'), payload.get('key'))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# Thread listener dijalankan per worker (setelah fork), sehingga cek pid dilakukan di setiap request
+def ensure_listener():
+    global _listener, _listener_pid
+    if not Config.CACHE_INVALIDATION_LISTENER or _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            _listener = InvalidationListener()
+            _listener.start()
+            _listener_pid = os.getpid()
+
+
+def init_app(app):
+    app.before_request(ensure_listener)
+
+
+def invalidation_metrics():
+    stats = dict(_stats)
+    stats['listening'] = bool(_listener is not None and _listener_pid == os.getpid() and _listener.is_alive())
+    return stats
+
+
+register_metrics('cache_invalidation', invalidation_metrics)
@@ -1,12 +1,51 @@
+import hashlib
+import threading
+import time
 import jwt
 from flask import current_app as app
+from config import Config
+from app.utils.cache import TTLCache, MISSING
+from app.utils.metrics import register_metrics
+
+# Cache hasil verifikasi token: digest token -> claims, agar HMAC dan parsing JSON cukup sekali per token
+decode_cache = TTLCache(maxsize=Config.JWT_CACHE_SIZE, ttl=Config.JWT_CACHE_TTL)
+register_metrics('jwt_cache', decode_cache.stats)
+
+_secret_fingerprint = None
+_fingerprint_lock = threading.Lock()
+
+def _fingerprint(secret_key):
+    global _secret_fingerprint
+    if isinstance(secret_key, str):
+        secret_key = secret_key.encode()
+    fingerprint = hashlib.sha256(secret_key).digest()
+    # Secret key berganti: semua claims yang diverifikasi dengan key lama dibuang
+    if fingerprint != _secret_fingerprint:
+        with _fingerprint_lock:
+            if fingerprint != _secret_fingerprint:
+                decode_cache.clear()
+                _secret_fingerprint = fingerprint
+    return fingerprint
 
 def encode_token(payload):
     return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
+# Sama seperti jwt.decode (termasuk exception-nya), tetapi memakai cache
+def decode_token_cached(token, secret_key):
+    key = hashlib.sha256(_fingerprint(secret_key) + token.encode()).digest()
+    claims = decode_cache.get(key)
+    if claims is MISSING:
+        claims = jwt.decode(token, secret_key, algorithms=['HS256'])
+        ttl = None
+        if 'exp' in claims:
+            # Entri tidak boleh hidup lebih lama dari masa berlaku token
+            ttl = float(claims['exp']) - time.time()
+        decode_cache.set(key, claims, ttl=ttl)
+    return dict(claims)
+
 def decode_token(token):
     try:
-        return jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        return decode_token_cached(token, app.config['SECRET_KEY'])
     except jwt.ExpiredSignatureError:
         return None  # Token has expired
     except jwt.InvalidTokenError:
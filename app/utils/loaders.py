@@ -0,0 +1,25 @@
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+from app.utils.db import get_db
+
+
+# Muat baris anak untuk sekumpulan parent dalam satu query (= ANY), lalu kelompokkan di memori.
+# Contoh: load_children(umkms, 'produk', 'id_umkm', 'products') mengisi umkm['products'] tiap UMKM.
+def load_children(parents, table, foreign_key, attr, parent_key='id', order_by='id'):
+    parent_ids = list({parent[parent_key] for parent in parents})
+    children = {}
+
+    if parent_ids:
+        query = sql.SQL('SELECT * FROM {table} WHERE {fk} = ANY(%s) ORDER BY {fk}, {order};').format(
+            table=sql.Identifier(table),
+            fk=sql.Identifier(foreign_key),
+            order=sql.Identifier(order_by),
+        )
+        with get_db().cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, (parent_ids,))
+            for row in cur:
+                children.setdefault(row[foreign_key], []).append(row)
+
+    for parent in parents:
+        parent[attr] = children.get(parent[parent_key], [])
+    return parents
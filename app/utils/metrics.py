@@ -0,0 +1,16 @@
+import threading
+
+_providers = {}
+_lock = threading.Lock()
+
+
+# Setiap subsistem mendaftarkan fungsi yang mengembalikan dict metrik miliknya
+def register_metrics(name, provider):
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_metrics():
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
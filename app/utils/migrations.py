@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+
+from app.utils.db import db_connection
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'migrations')
+
+# Nama file: NNN_deskripsi.sql, dijalankan berurutan menurut NNN
+_FILENAME = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+# Kunci advisory agar dua proses migrate tidak berjalan bersamaan
+_LOCK_ID = 7416001
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def _ensure_table(cur):
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(16) PRIMARY KEY,
+            name TEXT NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    ''')
+
+
+def migration_status(directory=MIGRATIONS_DIR):
+    with db_connection() as conn:
+        cur = conn.cursor()
+        _ensure_table(cur)
+        cur.execute('SELECT version, checksum FROM schema_migrations;')
+        applied = dict(cur.fetchall())
+        cur.close()
+
+    status = []
+    for version, name, path in list_migrations(directory):
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        if version not in applied:
+            state = 'pending'
+        elif applied[version] != checksum:
+            state = 'changed'
+        else:
+            state = 'applied'
+        status.append((version, name, state))
+    return status
+
+
+# Jalankan migrasi yang belum tercatat di schema_migrations. Setiap file berjalan dalam satu transaksi
+# bersama pencatatannya, jadi migrasi yang gagal tidak tercatat dan bisa diulang setelah diperbaiki.
+def apply_migrations(directory=MIGRATIONS_DIR, log=print):
+    applied_now = []
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT pg_advisory_lock(%s);', (_LOCK_ID,))
+        try:
+            _ensure_table(cur)
+            conn.commit()
+            cur.execute('SELECT version FROM schema_migrations;')
+            applied = {row[0] for row in cur.fetchall()}
+
+            for version, name, path in list_migrations(directory):
+                if version in applied:
+                    continue
+                with open(path, 'rb') as f:
+                    content = f.read()
+                log(f'Menjalankan migrasi {version}_{name}')
+                try:
+                    cur.execute(content.decode('utf-8'))
+                    cur.execute('''
+                        INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);
+                    ''', (version, name, hashlib.sha256(content).hexdigest()))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied_now.append(f'{version}_{name}')
+        finally:
+            cur.execute('SELECT pg_advisory_unlock(%s);', (_LOCK_ID,))
+            conn.commit()
+            cur.close()
+    return applied_now
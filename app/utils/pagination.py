@@ -0,0 +1,115 @@
+import base64
+import json
+from decimal import Decimal
+from collections import namedtuple
+
+from flask import request
+from psycopg2.extras import RealDictCursor
+from config import Config
+from app.utils.db import get_db
+
+
+class PaginationError(ValueError):
+    """Parameter limit/after tidak valid."""
+
+
+Page = namedtuple('Page', ['limit', 'after'])
+
+
+# Cursor dibuat opaque (base64 dari JSON) agar bisa memuat lebih dari satu nilai kunci
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError('Parameter after tidak valid')
+
+
+# Ambil ?limit=&after= dari query string, dengan batas Config.MAX_PAGE_SIZE
+def get_page_params():
+    limit = request.args.get('limit', Config.DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError('Parameter limit harus berupa angka')
+    if limit < 1:
+        raise PaginationError('Parameter limit minimal 1')
+    limit = min(limit, Config.MAX_PAGE_SIZE)
+
+    after = request.args.get('after')
+    if after:
+        after = decode_cursor(after)
+    return Page(limit, after or None)
+
+
+# Keyset pagination pada kolom id: "WHERE id > after ORDER BY id LIMIT n" tetap cepat di halaman
+# berapa pun, berbeda dengan OFFSET. Halaman dibatasi MAX_PAGE_SIZE baris, jadi dibaca dengan cursor biasa
+# dalam satu round trip; server-side (named) cursor hanya dipakai untuk streaming (app/utils/streaming.py).
+def fetch_page(base_query, conditions, params, page, key='id'):
+    conditions = list(conditions)
+    params = list(params)
+    if page.after is not None:
+        if not isinstance(page.after, int) or isinstance(page.after, bool):
+            raise PaginationError('Parameter after tidak valid')
+        conditions.append(f'{key} > %s')
+        params.append(page.after)
+
+    query = base_query
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {key} LIMIT %s;'
+    # Satu baris ekstra untuk mengetahui apakah masih ada halaman berikutnya
+    params.append(page.limit + 1)
+
+    cur = get_db().cursor(cursor_factory=RealDictCursor)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor(rows[-1][key])
+    return rows, next_cursor
+
+
+# Keyset pagination dengan urutan selain id: "(kolom, id) > (nilai, id)" memakai index (kolom, id)
+# sehingga tetap cepat di halaman berapa pun. Cursor berisi [nilai kolom urut, id] baris terakhir.
+def fetch_sorted_page(base_query, conditions, params, page, sort_column, sort_key,
+                      descending=False, id_column='id', id_key='id', sort_type=None):
+    conditions = list(conditions)
+    params = list(params)
+    if page.after is not None:
+        after = page.after
+        if (not isinstance(after, list) or len(after) != 2 or not isinstance(after[1], int)
+                or isinstance(after[1], bool) or after[0] is None):
+            raise PaginationError('Parameter after tidak valid')
+        # sort_type memaksa tipe nilai cursor (misal float8), agar tidak dibandingkan sebagai numeric
+        placeholder = f'%s::{sort_type}' if sort_type else '%s'
+        conditions.append(f"({sort_column}, {id_column}) {'<' if descending else '>'} ({placeholder}, %s)")
+        params.extend(after)
+
+    direction = 'DESC' if descending else 'ASC'
+    query = base_query
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {sort_column} {direction}, {id_column} {direction} LIMIT %s;'
+    params.append(page.limit + 1)
+
+    cur = get_db().cursor(cursor_factory=RealDictCursor)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1][sort_key]
+        # Decimal (harga) tidak bisa di-JSON-kan; dikirim sebagai string dan di-cast ulang oleh PostgreSQL
+        if isinstance(last, Decimal):
+            last = str(last)
+        next_cursor = encode_cursor([last, rows[-1][id_key]])
+    return rows, next_cursor
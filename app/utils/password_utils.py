@@ -0,0 +1,154 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from app.utils.metrics import register_metrics
+
+
+class HashPoolSaturated(Exception):
+    """Antrian hash password penuh; request login/registrasi ditolak dengan 503."""
+
+# Format hash: scrypt$<versi>$<n>$<r>$<p>$<salt>$<hash> (salt dan hash dalam base64).
+# Versi dan parameter biaya disimpan bersama hash, sehingga biaya bisa dinaikkan kapan saja:
+# hash lama tetap bisa diverifikasi dan di-rehash otomatis saat login berhasil.
+PREFIX = 'scrypt'
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+def _b64decode(data):
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r * p, dklen=Config.PASSWORD_HASH_DKLEN
+    )
+
+
+def hash_password(password):
+    n, r, p = Config.PASSWORD_HASH_N, Config.PASSWORD_HASH_R, Config.PASSWORD_HASH_P
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return '$'.join([PREFIX, str(Config.PASSWORD_HASH_VERSION), str(n), str(r), str(p), _b64encode(salt), _b64encode(digest)])
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(PREFIX + '$')
+
+
+def _parse(stored):
+    _, version, n, r, p, salt, digest = stored.split('$')
+    return int(version), int(n), int(r), int(p), _b64decode(salt), _b64decode(digest)
+
+
+def verify_password(password, stored):
+    if not stored or password is None:
+        return False
+    if not is_hashed(stored):
+        # Password lama masih berupa plaintext: dibandingkan constant-time lalu di-rehash oleh pemanggil
+        return hmac.compare_digest(password.encode(), stored.encode())
+    try:
+        _, n, r, p, salt, digest = _parse(stored)
+    except ValueError:
+        return False
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p), digest)
+
+
+# True jika hash dibuat dengan versi/parameter lama (atau masih plaintext)
+def needs_rehash(stored):
+    if not is_hashed(stored):
+        return True
+    try:
+        version, n, r, p, _, _ = _parse(stored)
+    except ValueError:
+        return True
+    current = (Config.PASSWORD_HASH_VERSION, Config.PASSWORD_HASH_N, Config.PASSWORD_HASH_R, Config.PASSWORD_HASH_P)
+    return (version, n, r, p) != current
+
+
+# Hash/verifikasi password dijalankan di thread pool terpisah yang ukurannya dibatasi
+# (hashlib.scrypt melepas GIL). Lonjakan login hanya memakai PASSWORD_HASH_WORKERS core, dan jika
+# antrian melebihi PASSWORD_HASH_QUEUE_LIMIT request langsung ditolak, bukan menumpuk.
+class HashExecutor:
+    def __init__(self, workers, queue_limit, latency_window=1000):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=latency_window)
+        self._stats = {'completed': 0, 'rejected': 0}
+
+    def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashPoolSaturated('Antrian hash password penuh')
+        start = time.monotonic()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._executor.submit(func, *args).result()
+        finally:
+            latency = time.monotonic() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._stats['completed'] += 1
+                self._latencies.append(latency)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            in_flight = self._in_flight
+            latencies = sorted(self._latencies)
+        stats.update({
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'in_flight': in_flight,
+            'queue_depth': max(in_flight - self.workers, 0),
+        })
+        for name, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            stats[f'latency_{name}_ms'] = latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000 if latencies else None
+        return stats
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+# Executor dibuat per proses, karena thread pool tidak ikut tersalin saat worker di-fork
+def get_hash_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = HashExecutor(Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_QUEUE_LIMIT)
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def hash_password_bounded(password):
+    return get_hash_executor().run(hash_password, password)
+
+
+def verify_password_bounded(password, stored):
+    return get_hash_executor().run(verify_password, password, stored)
+
+
+def hash_metrics():
+    if _executor is None or _executor_pid != os.getpid():
+        return {'workers': Config.PASSWORD_HASH_WORKERS, 'queue_limit': Config.PASSWORD_HASH_QUEUE_LIMIT, 'in_flight': 0}
+    return _executor.stats()
+
+
+register_metrics('password_hash', hash_metrics)
@@ -0,0 +1,67 @@
+import uuid
+
+from flask import Response, current_app, request, stream_with_context
+from psycopg2.extras import RealDictCursor
+from config import Config
+from app.utils.db import get_db
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+# Mode streaming dipakai jika klien meminta NDJSON atau menambahkan ?stream=true
+def wants_stream():
+    return wants_ndjson() or request.args.get('stream', '').lower() == 'true'
+
+def wants_ndjson():
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+# Generator batch baris dari server-side (named) cursor, urut berdasarkan key.
+# Baru mengeksekusi query saat pertama kali diiterasi.
+def iter_rows(base_query, conditions, params, key='id', batch_size=None):
+    batch_size = batch_size or Config.STREAM_BATCH_SIZE
+    query = base_query
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += f' ORDER BY {key};'
+
+    cur = get_db().cursor(name=f'stream_{uuid.uuid4().hex}', cursor_factory=RealDictCursor)
+    cur.itersize = batch_size
+    try:
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
+
+
+# Tulis hasil query sebagai JSON array (atau NDJSON) per batch, sehingga memori worker tetap datar.
+# transform mengubah satu baris, batch_transform mengubah satu batch (misal memuat produk sekaligus).
+def stream_json(batches, transform=None, batch_transform=None):
+    ndjson = wants_ndjson()
+    dumps = current_app.json.dumps
+
+    def generate():
+        first = True
+        if not ndjson:
+            yield '['
+        for rows in batches:
+            if batch_transform:
+                rows = batch_transform(rows)
+            if transform:
+                rows = [transform(row) for row in rows]
+            if ndjson:
+                yield ''.join(dumps(row) + '\n' for row in rows)
+            else:
+                chunk = ','.join(dumps(row) for row in rows)
+                if chunk:
+                    yield chunk if first else ',' + chunk
+                    first = False
+        if not ndjson:
+            yield ']'
+
+    mimetype = NDJSON_MIMETYPE if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
@@ -0,0 +1,135 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import Config
+from app.utils.metrics import register_metrics
+from app.utils.uploads import upload_dir, register_upload_processor, register_blob_cleanup
+
+# Pillow opsional: tanpa Pillow upload tetap disimpan, hanya thumbnail yang tidak dibuat
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_KINDS = ('foto_umkm', 'foto_produk')
+
+_stats = {'generated': 0, 'cached': 0, 'skipped': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+# Turunan disimpan berdasarkan hash isi + ukuran, jadi foto yang sama cukup diproses sekali
+def variant_path(sha256, size):
+    return os.path.join(upload_dir(), 'variants', sha256[:2], sha256[2:4], f'{sha256}-{size}.webp')
+
+
+# URL foto asli dan thumbnail WebP untuk JSON UMKM/produk. Thumbnail yang belum selesai dibuat
+# dilayani dengan file aslinya.
+def upload_variants(key):
+    if not key:
+        return None
+    variants = {'original': f'/uploads/{key}'}
+    if Image is not None:
+        for size in Config.THUMBNAIL_SIZES:
+            variants[f'w{size}'] = f'/uploads/{key}?size={size}'
+    return variants
+
+
+# Dijalankan di proses terpisah: resize memakai CPU dan tidak melepas GIL sepenuhnya
+def _render(src, dest, size, quality):
+    with Image.open(src) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f'{dest}.{os.getpid()}.tmp'
+        image.save(tmp, 'WEBP', quality=quality)
+    os.replace(tmp, dest)
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+# Proses anak memakai 'spawn' karena pool dibuat dari thread worker upload (fork + thread tidak aman)
+def get_thumbnail_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ProcessPoolExecutor(max_workers=Config.THUMBNAIL_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def generate_thumbnails(key, path):
+    if Image is None:
+        _count('skipped')
+        return
+    sha256 = os.path.basename(path)
+    futures = []
+    for size in Config.THUMBNAIL_SIZES:
+        dest = variant_path(sha256, size)
+        if os.path.exists(dest):
+            _count('cached')
+            continue
+        futures.append(get_thumbnail_executor().submit(_render, path, dest, size, Config.THUMBNAIL_QUALITY))
+    for future in futures:
+        try:
+            future.result()
+            _count('generated')
+        except BrokenProcessPool:
+            # Proses anak mati (misal kehabisan memori): pool dibuat ulang untuk upload berikutnya
+            logger.exception('Pool proses thumbnail rusak saat memproses upload %s', key)
+            _count('failed')
+            _reset_executor()
+        except Exception as e:
+            # Upload yang bukan gambar (atau rusak) tetap disimpan, hanya tanpa thumbnail
+            logger.warning('Gagal membuat thumbnail upload %s: %s', key, e)
+            _count('failed')
+
+
+def remove_thumbnails(sha256):
+    for size in Config.THUMBNAIL_SIZES:
+        try:
+            os.unlink(variant_path(sha256, size))
+        except FileNotFoundError:
+            pass
+
+
+# Thumbnail dibuat oleh worker upload setelah foto UMKM/produk tersimpan
+def init_app(app):
+    for kind in IMAGE_KINDS:
+        register_upload_processor(kind, generate_thumbnails)
+    register_blob_cleanup(remove_thumbnails)
+
+
+def thumbnail_metrics():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['available'] = Image is not None
+    return stats
+
+
+register_metrics('thumbnails', thumbnail_metrics)
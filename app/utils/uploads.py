@@ -0,0 +1,364 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Request, request, current_app
+from werkzeug.utils import secure_filename
+from config import Config
+from app.utils.db import get_db, db_connection, call_after_commit
+from app.utils.metrics import register_metrics
+
+logger = logging.getLogger(__name__)
+
+_processors = {}
+_blob_cleanups = []
+_stats = {'saved': 0, 'copied': 0, 'processed': 0, 'deduplicated': 0, 'released': 0, 'collected': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+
+def upload_dir():
+    return Config.UPLOAD_DIR
+
+
+def _tmp_dir():
+    return os.path.join(upload_dir(), 'tmp')
+
+
+# Blob disimpan berdasarkan isi (SHA-256) dengan dua tingkat direktori: blobs/ab/cd/abcd...
+def blob_path(sha256):
+    return os.path.join(upload_dir(), 'blobs', sha256[:2], sha256[2:4], sha256)
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+# File sementara yang menghitung SHA-256 sambil ditulis parser multipart, sehingga hash sudah
+# tersedia saat request selesai diterima tanpa membaca ulang file
+class HashingFile:
+    def __init__(self, file):
+        self._file = file
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def write(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+# Tandai view yang menyimpan file lewat save_upload. Pasang paling dekat ke fungsi view: functools.wraps
+# di decorator lain ikut menyalin tandanya ke fungsi yang didaftarkan di route.
+def spools_uploads(f):
+    f.spools_uploads = True
+    return f
+
+
+# Untuk view bertanda spools_uploads, parser multipart langsung menulis setiap file upload (per chunk) ke
+# file sementara bernama di UPLOAD_DIR/tmp. Menyimpan upload cukup dengan os.replace, tanpa menyalin ulang
+# isi file di request. File di endpoint lain (misal CSV /produk/import) memakai penampungan bawaan Werkzeug.
+class UploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not getattr(current_app.view_functions.get(self.endpoint), 'spools_uploads', False):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = tempfile.NamedTemporaryFile(dir=_tmp_dir(), prefix='upload-', delete=False)
+        self.__dict__.setdefault('upload_temp_files', []).append(stream.name)
+        return HashingFile(stream)
+
+
+# processor(key, path) dijalankan di worker latar belakang setelah upload di-commit
+def register_upload_processor(kind, processor):
+    processors = _processors.setdefault(kind, [])
+    if processor not in processors:
+        processors.append(processor)
+
+
+# cleanup(sha256) dijalankan gc-uploads saat blob dihapus, untuk membuang file turunannya
+def register_blob_cleanup(cleanup):
+    if cleanup not in _blob_cleanups:
+        _blob_cleanups.append(cleanup)
+
+
+def _spool(stream):
+    if isinstance(stream, HashingFile):
+        stream.flush()
+        return stream.name, stream.hexdigest(), stream.size
+    # Upload kecil/bukan dari UploadRequest: salin per chunk ke file sementara sambil dihitung hash-nya
+    _count('copied')
+    stream.seek(0)
+    with tempfile.NamedTemporaryFile(dir=_tmp_dir(), prefix='upload-', delete=False) as tmp:
+        hashing = HashingFile(tmp)
+        shutil.copyfileobj(stream, hashing, Config.UPLOAD_CHUNK_SIZE)
+    return tmp.name, hashing.hexdigest(), hashing.size
+
+
+# Simpan file upload dan kembalikan key-nya (disimpan di kolom foto_umkm/dokumen/foto_produk).
+# Isi yang sudah ada di blob store tidak ditulis ulang, cukup refcount-nya yang dinaikkan. Checksum sudah
+# dihitung selama upload diterima (HashingFile), jadi dedup langsung dilakukan di sini tanpa membaca ulang
+# file; worker latar belakang hanya menjalankan processor (thumbnail) dan menandai upload siap.
+def save_upload(file, kind):
+    path, sha256, size = _spool(file.stream)
+    ext = os.path.splitext(secure_filename(file.filename or ''))[1].lower()
+    key = f'{uuid.uuid4().hex}{ext}'
+
+    cur = get_db().cursor()
+    # Baris blob dikunci sampai transaksi request selesai, sehingga gc-uploads tidak bisa menghapus
+    # file blob ini di antara pengecekan os.path.exists dan commit
+    cur.execute('''
+        INSERT INTO upload_blob (sha256, size, refcount) VALUES (%s, %s, 1)
+        ON CONFLICT (sha256) DO UPDATE SET refcount = upload_blob.refcount + 1;
+    ''', (sha256, size))
+    # Blob yatim (tanpa baris upload_blob yang ter-commit) dihapus gc-uploads di bawah kunci eksklusif
+    # yang sama, jadi file yang dipakai ulang di sini tidak bisa dihapus sebelum transaksi ini selesai
+    cur.execute('SELECT pg_advisory_xact_lock_shared(hashtext(%s));', (sha256,))
+    dest = blob_path(sha256)
+    if os.path.exists(dest):
+        os.unlink(path)
+        # mtime diperbarui agar blob ini juga kembali masuk masa tunggu gc-uploads
+        os.utime(dest)
+        _count('deduplicated')
+    else:
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(path, dest)
+
+    cur.execute('''
+        INSERT INTO upload (key, kind, original_name, content_type, size, sha256, status)
+        VALUES (%s, %s, %s, %s, %s, %s, 'pending');
+    ''', (key, kind, file.filename, file.mimetype, size, sha256))
+    cur.close()
+    _count('saved')
+
+    call_after_commit(submit_upload, key)
+    return key
+
+
+# Lepaskan upload yang tidak dipakai lagi (UMKM/produk dihapus atau filenya diganti).
+# Blob dengan refcount 0 baru dihapus dari disk oleh perintah gc-uploads.
+def release_uploads(keys):
+    keys = [key for key in keys if key]
+    if not keys:
+        return
+    cur = get_db().cursor()
+    # Yang dihitung adalah baris upload yang dilepas, bukan baris upload_blob yang diperbarui
+    # (beberapa upload hasil dedup bisa menunjuk blob yang sama)
+    cur.execute('''
+        WITH released AS (
+            DELETE FROM upload WHERE key = ANY(%s) RETURNING sha256
+        ), updated AS (
+            UPDATE upload_blob b SET refcount = b.refcount - r.count, released_at = now()
+            FROM (SELECT sha256, COUNT(*) AS count FROM released GROUP BY sha256) r
+            WHERE b.sha256 = r.sha256
+        )
+        SELECT COUNT(*) FROM released;
+    ''', (keys,))
+    _count('released', cur.fetchone()[0])
+    cur.close()
+
+
+def get_upload(key):
+    cur = get_db().cursor()
+    cur.execute('SELECT key, kind, original_name, content_type, size, sha256, status FROM upload WHERE key = %s;', (key,))
+    row = cur.fetchone()
+    cur.close()
+    if not row:
+        return None
+    return dict(zip(('key', 'kind', 'original_name', 'content_type', 'size', 'sha256', 'status'), row))
+
+
+# Kolom UMKM/produk yang menyimpan key (atau nama file lama) ini beserta pemilik UMKM-nya:
+# [(kolom, id_user), ...]. Kosong berarti file tidak dipakai di mana pun.
+def find_upload_references(key):
+    cur = get_db().cursor()
+    cur.execute('''
+        SELECT 'dokumen', id_user FROM umkm WHERE dokumen = %s
+        UNION ALL
+        SELECT 'foto_umkm', id_user FROM umkm WHERE foto_umkm = %s
+        UNION ALL
+        SELECT 'foto_produk', u.id_user FROM produk p JOIN umkm u ON u.id = p.id_umkm WHERE p.foto_produk = %s;
+    ''', (key, key, key))
+    references = cur.fetchall()
+    cur.close()
+    return references
+
+
+# Koneksi hanya dipinjam untuk membaca dan menandai status, tidak selama processor berjalan
+# (thumbnail bisa lama menunggu process pool), agar pool tidak habis oleh antrian upload
+def process_upload(key):
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute('SELECT kind, sha256 FROM upload WHERE key = %s;', (key,))
+                row = cur.fetchone()
+        if not row:
+            return
+        kind, sha256 = row
+        for processor in _processors.get(kind, []):
+            processor(key, blob_path(sha256))
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE upload SET status = 'ready', processed_at = now() WHERE key = %s;", (key,))
+        _count('processed')
+    except Exception:
+        logger.exception('Gagal memproses upload %s', key)
+        _count('failed')
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("UPDATE upload SET status = 'failed', processed_at = now() WHERE key = %s;", (key,))
+        except Exception:
+            logger.exception('Gagal menandai upload %s sebagai failed', key)
+
+
+# Upload dari layout lama (UPLOAD_DIR/files/<key>) dipindah ke blob store
+def _adopt_legacy_files(cur):
+    files_dir = os.path.join(upload_dir(), 'files')
+    if not os.path.isdir(files_dir):
+        return
+    for key in os.listdir(files_dir):
+        cur.execute('SELECT sha256 FROM upload WHERE key = %s AND sha256 IS NOT NULL;', (key,))
+        row = cur.fetchone()
+        if not row:
+            continue
+        dest = blob_path(row[0])
+        if os.path.exists(dest):
+            os.unlink(os.path.join(files_dir, key))
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(os.path.join(files_dir, key), dest)
+
+
+# File blob tanpa baris upload_blob (transaksi upload di-rollback setelah file dipindah)
+def _orphan_blobs(cur, grace_seconds):
+    deadline = time.time() - grace_seconds
+    candidates = []
+    for root, _, names in os.walk(os.path.join(upload_dir(), 'blobs')):
+        candidates.extend(os.path.join(root, name) for name in names if os.path.getmtime(os.path.join(root, name)) < deadline)
+    orphans = []
+    for start in range(0, len(candidates), 500):
+        batch = {os.path.basename(path): path for path in candidates[start:start + 500]}
+        cur.execute('SELECT sha256 FROM upload_blob WHERE sha256 = ANY(%s);', (list(batch),))
+        known = {row[0] for row in cur.fetchall()}
+        orphans.extend(path for sha256, path in batch.items() if sha256 not in known)
+    return orphans
+
+
+# Hapus blob yang refcount-nya 0 lebih lama dari grace period, blob yatim, dan file sementara yang
+# tertinggal (misal proses mati di tengah upload). Dipanggil dari manage.py gc-uploads.
+def collect_garbage(grace_seconds):
+    removed = 0
+    with db_connection() as conn:
+        cur = conn.cursor()
+        _adopt_legacy_files(cur)
+        while True:
+            # Baris dikunci selama file dihapus; upload baru dengan isi sama menunggu lalu menulis ulang blob
+            cur.execute('''
+                SELECT sha256 FROM upload_blob
+                WHERE refcount <= 0 AND released_at < now() - make_interval(secs => %s)
+                LIMIT 100 FOR UPDATE SKIP LOCKED;
+            ''', (grace_seconds,))
+            shas = [row[0] for row in cur.fetchall()]
+            if not shas:
+                break
+            for sha256 in shas:
+                try:
+                    os.unlink(blob_path(sha256))
+                except FileNotFoundError:
+                    pass
+                for cleanup in _blob_cleanups:
+                    cleanup(sha256)
+            cur.execute('DELETE FROM upload_blob WHERE sha256 = ANY(%s);', (shas,))
+            conn.commit()
+            removed += len(shas)
+
+        for path in _orphan_blobs(cur, grace_seconds):
+            sha256 = os.path.basename(path)
+            # Menunggu upload yang sedang memakai ulang blob ini (lihat save_upload), lalu dicek ulang:
+            # baris upload_blob-nya mungkin baru saja di-commit, atau mtime-nya baru diperbarui
+            cur.execute('SELECT pg_advisory_xact_lock(hashtext(%s));', (sha256,))
+            cur.execute('SELECT 1 FROM upload_blob WHERE sha256 = %s;', (sha256,))
+            try:
+                orphan = cur.fetchone() is None and os.path.getmtime(path) < time.time() - grace_seconds
+                if orphan:
+                    os.unlink(path)
+            except FileNotFoundError:
+                orphan = False
+            if orphan:
+                for cleanup in _blob_cleanups:
+                    cleanup(sha256)
+                removed += 1
+            conn.commit()
+        cur.close()
+
+    tmp_dir = _tmp_dir()
+    for name in os.listdir(tmp_dir):
+        path = os.path.join(tmp_dir, name)
+        if os.path.getmtime(path) < time.time() - grace_seconds:
+            os.unlink(path)
+    _count('collected', removed)
+    return removed
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+# Executor dibuat per proses, karena thread pool tidak ikut tersalin saat worker di-fork
+def get_upload_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(max_workers=Config.UPLOAD_WORKERS, thread_name_prefix='upload')
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def submit_upload(key):
+    get_upload_executor().submit(process_upload, key)
+
+
+# File sementara yang tidak dipindah (request gagal/field tidak dipakai) dihapus di akhir request
+def _cleanup_temp_files(exc=None):
+    for path in request.__dict__.get('upload_temp_files', []):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def init_app(app):
+    if Config.UPLOAD_DIR is None:
+        Config.UPLOAD_DIR = os.path.join(app.root_path, 'uploads')
+    # Direktori dibuat sekali saat startup, bukan di setiap request upload
+    os.makedirs(_tmp_dir(), exist_ok=True)
+    os.makedirs(os.path.join(upload_dir(), 'blobs'), exist_ok=True)
+    app.request_class = UploadRequest
+    app.teardown_request(_cleanup_temp_files)
+
+
+def upload_metrics():
+    with _stats_lock:
+        stats = dict(_stats)
+    if _executor is not None and _executor_pid == os.getpid():
+        stats['queued'] = _executor._work_queue.qsize()
+    return stats
+
+
+register_metrics('uploads', upload_metrics)
@@ -7,9 +7,96 @@ class Config:
         'dbname': 'umkm',
         'user': 'postgres',
         'password': 'artha',
-        'host': 'localhost'
+        'host': 'localhost',
+        # Pengaturan connection pool (tidak diteruskan ke psycopg2.connect)
+        'pool_min': int(os.getenv('DB_POOL_MIN', 1)),
+        'pool_max': int(os.getenv('DB_POOL_MAX', 10)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 5)),
+        'pool_health_check_interval': float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))
     }
     
+    # Cache status suspend user di hook authenticate
+    SUSPENSION_CACHE_SIZE = int(os.getenv('SUSPENSION_CACHE_SIZE', 10000))
+    SUSPENSION_CACHE_TTL = float(os.getenv('SUSPENSION_CACHE_TTL', 300))
+
+    # Cache token JWT yang sudah diverifikasi
+    JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', 10000))
+    JWT_CACHE_TTL = float(os.getenv('JWT_CACHE_TTL', 300))
+
+    # Cache status UMKM (id_user, status_umkm) untuk middleware UMKM/produk
+    UMKM_STATUS_CACHE_SIZE = int(os.getenv('UMKM_STATUS_CACHE_SIZE', 10000))
+    UMKM_STATUS_CACHE_TTL = float(os.getenv('UMKM_STATUS_CACHE_TTL', 300))
+
+    # Listener LISTEN/NOTIFY per worker untuk invalidasi cache antar worker
+    CACHE_INVALIDATION_LISTENER = os.getenv('CACHE_INVALIDATION_LISTENER', 'true').lower() == 'true'
+
+    # Keyset pagination untuk endpoint list (?limit=&after=)
+    DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+
+    # Jumlah baris per batch untuk respons streaming (?stream=true atau Accept: application/x-ndjson)
+    STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+    # Hash password (scrypt). Naikkan PASSWORD_HASH_VERSION setiap kali parameter biaya diubah;
+    # hash lama akan di-rehash otomatis saat user berhasil login.
+    PASSWORD_HASH_VERSION = int(os.getenv('PASSWORD_HASH_VERSION', 1))
+    PASSWORD_HASH_N = int(os.getenv('PASSWORD_HASH_N', 2 ** 14))
+    PASSWORD_HASH_R = int(os.getenv('PASSWORD_HASH_R', 8))
+    PASSWORD_HASH_P = int(os.getenv('PASSWORD_HASH_P', 1))
+    PASSWORD_HASH_DKLEN = 32
+    # Thread pool khusus hash password: jumlah worker dan batas antrian sebelum ditolak dengan 503
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE_LIMIT', 32))
+
+    # Jumlah id user yang diambil sekaligus dari sequence per proses (registrasi cukup satu INSERT)
+    USER_ID_BLOCK_SIZE = int(os.getenv('USER_ID_BLOCK_SIZE', 50))
+
+    # Total global dashboard (materialized view dashboard_statistik) di-refresh setiap interval ini (detik)
+    DASHBOARD_REFRESH_INTERVAL = float(os.getenv('DASHBOARD_REFRESH_INTERVAL', 60))
+
+    # Penulisan event login ke tabel login_audit per batch: interval flush (detik), ukuran batch,
+    # dan batas event yang ditampung di memori jika database sedang tidak bisa ditulis
+    AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', 500))
+    AUDIT_MAX_BUFFER = int(os.getenv('AUDIT_MAX_BUFFER', 10000))
+
+    # Penyimpanan upload. UPLOAD_DIR kosong berarti app/uploads. File ditulis per chunk UPLOAD_CHUNK_SIZE,
+    # checksum/dedup dijalankan oleh UPLOAD_WORKERS thread di background.
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR')
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+    # Blob tanpa referensi baru dihapus gc-uploads setelah lewat masa tunggu ini (detik)
+    UPLOAD_GC_GRACE = float(os.getenv('UPLOAD_GC_GRACE', 3600))
+
+    # Penyajian file upload: USE_X_SENDFILE untuk Apache/lighttpd, UPLOAD_ACCEL_REDIRECT (prefix location
+    # internal nginx yang menunjuk ke UPLOAD_DIR) untuk nginx; tanpa keduanya dipakai sendfile dari server WSGI
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
+    UPLOAD_ACCEL_REDIRECT = os.getenv('UPLOAD_ACCEL_REDIRECT')
+    UPLOAD_CACHE_MAX_AGE = int(os.getenv('UPLOAD_CACHE_MAX_AGE', 365 * 24 * 3600))
+    # Hanya tipe ini yang ditampilkan inline di browser; file lain selalu diunduh sebagai attachment
+    UPLOAD_INLINE_TYPES = tuple(os.getenv('UPLOAD_INLINE_TYPES', 'image/jpeg,image/png,image/gif,image/webp,application/pdf').split(','))
+
+    # Thumbnail WebP untuk foto UMKM/produk (butuh Pillow), dibuat oleh THUMBNAIL_WORKERS proses
+    THUMBNAIL_SIZES = tuple(int(size) for size in os.getenv('THUMBNAIL_SIZES', '160,480').split(','))
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+    THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+    # Import produk massal (POST /produk/import): batas baris per file dan jumlah error baris yang dikembalikan
+    PRODUK_IMPORT_MAX_ROWS = int(os.getenv('PRODUK_IMPORT_MAX_ROWS', 50000))
+    PRODUK_IMPORT_MAX_ERRORS = int(os.getenv('PRODUK_IMPORT_MAX_ERRORS', 1000))
+
+    # Export katalog UMKM/produk (GET /admin/export, manage.py export) memakai koneksi tersendiri di luar pool,
+    # opsional ke replica lewat EXPORT_DATABASE_DSN. Data dikirim per chunk EXPORT_CHUNK_SIZE byte melalui
+    # antrian berisi paling banyak EXPORT_QUEUE_SIZE chunk; Parquet ditulis per EXPORT_BATCH_SIZE baris.
+    EXPORT_DATABASE_DSN = os.getenv('EXPORT_DATABASE_DSN')
+    EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', 2))
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 64 * 1024))
+    EXPORT_QUEUE_SIZE = int(os.getenv('EXPORT_QUEUE_SIZE', 16))
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 10000))
+    # Batas waktu (detik) export lewat HTTP: statement_timeout COPY di database, dan batas menunggu klien
+    # mengambil chunk. Export lewat manage.py tidak dibatasi.
+    EXPORT_TIMEOUT = int(os.getenv('EXPORT_TIMEOUT', 600))
+
     # Logging configuration
     LOG_LEVEL = logging.DEBUG
     LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
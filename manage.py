@@ -0,0 +1,221 @@
+import argparse
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from app import create_app
+from app.utils.db import get_db, db_connection
+
+
+def hash_passwords(args):
+    from app.services.auth_service import hash_plaintext_passwords
+
+    app = create_app()
+    with app.app_context():
+        total = hash_plaintext_passwords(args.batch_size)
+        get_db().commit()
+    print(f'{total} password plaintext telah di-hash')
+
+
+def _hash_for(seconds):
+    from app.utils.password_utils import hash_password
+
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        hash_password('benchmark-password')
+        count += 1
+    return count
+
+
+# Mengukur kapasitas hash per core untuk menentukan kapasitas login
+def bench_password(args):
+    from config import Config
+
+    print(f'scrypt n={Config.PASSWORD_HASH_N} r={Config.PASSWORD_HASH_R} p={Config.PASSWORD_HASH_P}')
+    count = _hash_for(args.seconds)
+    per_core = count / args.seconds
+    print(f'1 core : {per_core:.1f} hash/detik ({1000 / per_core:.1f} ms per hash)')
+
+    workers = args.workers or os.cpu_count() or 1
+    with Pool(workers) as pool:
+        total = sum(pool.map(_hash_for, [args.seconds] * workers))
+    print(f'{workers} core: {total / args.seconds:.1f} hash/detik ({total / args.seconds / workers:.1f} per core)')
+
+
+def gc_uploads(args):
+    from app.utils.uploads import collect_garbage
+    from config import Config
+
+    grace = Config.UPLOAD_GC_GRACE if args.grace is None else args.grace
+    app = create_app()
+    with app.app_context():
+        removed = collect_garbage(grace)
+    print(f'{removed} blob upload tanpa referensi telah dihapus')
+
+
+# Refresh total global dashboard sekarang juga (misal dari cron, atau setelah import data besar)
+def refresh_dashboard(args):
+    from app.services.dashboard_service import refresh_dashboard_statistik
+
+    app = create_app()
+    with app.app_context():
+        refresh_dashboard_statistik()
+    print('dashboard_statistik telah di-refresh')
+
+
+def migrate(args):
+    from app.utils.migrations import apply_migrations, migration_status
+
+    app = create_app()
+    with app.app_context():
+        if args.status:
+            for version, name, state in migration_status():
+                print(f'{version}_{name:<30} {state}')
+            return
+        applied = apply_migrations()
+    print(f'{len(applied)} migrasi dijalankan')
+
+
+# EXPLAIN setiap query di app/services; gagal (exit 1) jika ada query yang hanya bisa dengan Seq Scan
+def check_indexes(args):
+    from app.utils.index_check import collect_queries, check_queries
+
+    app = create_app()
+    with app.app_context():
+        results = check_queries(collect_queries())
+
+    failed = 0
+    for location, query, state, detail in results:
+        if state in ('seq_scan', 'error'):
+            failed += 1
+        if state != 'ok' or args.verbose:
+            print(f"{state:<9} {location}{f' ({detail})' if detail else ''}")
+            if args.verbose:
+                print('    ' + ' '.join(query.split()))
+    print(f'{len(results)} query dicek, {failed} tanpa index')
+    if failed:
+        raise SystemExit(1)
+
+
+# Export katalog UMKM/produk ke file (atau stdout dengan --output -) tanpa lewat endpoint JSON
+def export(args):
+    from app.services.export_service import copy_csv, write_parquet
+
+    if args.format == 'parquet':
+        if args.output == '-':
+            raise SystemExit('Export Parquet membutuhkan --output berupa path file')
+        total = write_parquet(args.output, args.status)
+        print(f'{total} baris ditulis ke {args.output}', file=sys.stderr)
+    elif args.output == '-':
+        copy_csv(sys.stdout.buffer, args.status)
+    else:
+        with open(args.output, 'wb') as f:
+            copy_csv(f, args.status)
+        print(f'Export CSV ditulis ke {args.output}', file=sys.stderr)
+
+
+def _signup_legacy(cur, no_hp, password):
+    from flask import current_app
+    from app.utils.password_utils import hash_password
+    import jwt
+
+    password_hash = hash_password(password)
+    # Sama seperti get_first_empty_id lama: anti-join seluruh tabel "user" untuk mencari id kosong
+    cur.execute('''
+        SELECT id + 1 AS next_id
+        FROM "user" u
+        WHERE NOT EXISTS (SELECT 1 FROM "user" u2 WHERE u2.id = u.id + 1)
+        ORDER BY id
+        LIMIT 1;
+    ''')
+    row = cur.fetchone()
+    user_id = row[0] if row else 1
+    cur.execute('''
+        INSERT INTO "user" (id, no_hp, log, password, role, timestamp)
+        VALUES (%s, %s, 'bench', %s, 'USER', now()) RETURNING id;
+    ''', (user_id, no_hp, password_hash))
+    cur.connection.commit()
+    token = jwt.encode({'id': user_id, 'no_hp': no_hp, 'role': 'USER'}, current_app.config['SECRET_KEY'], algorithm='HS256')
+    cur.execute('UPDATE "user" SET token = %s WHERE id = %s;', (token, user_id))
+    cur.connection.commit()
+
+
+def _signup_single(cur, no_hp, password):
+    from app.services.auth_service import add_user
+
+    add_user(no_hp, password, 'USER')
+    get_db().commit()
+
+
+# Membandingkan registrasi lama (cari id kosong, INSERT + commit, lalu UPDATE token + commit) dengan
+# add_user sekarang. Parameter scrypt diturunkan selama benchmark agar yang terlihat hanya biaya database.
+# add_user dijalankan lebih dulu: id dari jalur lama (celah pertama atau MAX(id) + 1) bisa bentrok dengan
+# sequence jika urutannya dibalik.
+def bench_signup(args):
+    from config import Config
+
+    Config.PASSWORD_HASH_N = 2 ** 4
+    app = create_app()
+    with app.app_context():
+        prefix = f'bench-{os.getpid()}-'
+        try:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    for name, signup in (('satu INSERT', _signup_single), ('lama (2 transaksi)', _signup_legacy)):
+                        start = time.perf_counter()
+                        for i in range(args.count):
+                            signup(cur, f'{prefix}{name[0]}{i}', 'benchmark-password')
+                        elapsed = time.perf_counter() - start
+                        print(f'{name:<20}: {args.count / elapsed:.1f} signup/detik')
+        finally:
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    cur.execute('DELETE FROM "user" WHERE no_hp LIKE %s;', (prefix + '%',))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perintah pemeliharaan restAPI-umkm')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    cmd = commands.add_parser('hash-passwords', help='Hash semua password user yang masih plaintext')
+    cmd.add_argument('--batch-size', type=int, default=200)
+    cmd.set_defaults(func=hash_passwords)
+
+    cmd = commands.add_parser('bench-password', help='Ukur jumlah hash password per detik per core')
+    cmd.add_argument('--seconds', type=float, default=3)
+    cmd.add_argument('--workers', type=int, default=0)
+    cmd.set_defaults(func=bench_password)
+
+    cmd = commands.add_parser('bench-signup', help='Bandingkan signup/detik registrasi lama dan sekarang')
+    cmd.add_argument('--count', type=int, default=500)
+    cmd.set_defaults(func=bench_signup)
+
+    cmd = commands.add_parser('gc-uploads', help='Hapus blob upload yang tidak lagi direferensikan')
+    cmd.add_argument('--grace', type=float, default=None, help='Masa tunggu (detik) sejak blob terakhir dilepas')
+    cmd.set_defaults(func=gc_uploads)
+
+    cmd = commands.add_parser('refresh-dashboard', help='Hitung ulang total global dashboard')
+    cmd.set_defaults(func=refresh_dashboard)
+
+    cmd = commands.add_parser('migrate', help='Jalankan migrasi di folder migrations yang belum diterapkan')
+    cmd.add_argument('--status', action='store_true', help='Tampilkan status migrasi tanpa menjalankannya')
+    cmd.set_defaults(func=migrate)
+
+    cmd = commands.add_parser('check-indexes', help='Pastikan setiap query di app/services memakai index')
+    cmd.add_argument('--verbose', action='store_true', help='Tampilkan semua query beserta SQL-nya')
+    cmd.set_defaults(func=check_indexes)
+
+    cmd = commands.add_parser('export', help='Export UMKM beserta produknya ke CSV atau Parquet')
+    cmd.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    cmd.add_argument('--output', default='-', help='Path file tujuan, - untuk stdout (hanya csv)')
+    cmd.add_argument('--status', choices=('semua', 'aktif', 'nonaktif'), default='semua')
+    cmd.set_defaults(func=export)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+-- Skema dasar tabel "user", umkm dan produk seperti yang dipakai aplikasi sejak awal.
+-- Memakai IF NOT EXISTS sehingga aman dijalankan pada database yang tabelnya sudah dibuat manual;
+-- perubahan berikutnya ada di migrasi bernomor setelah ini.
+CREATE TABLE IF NOT EXISTS "user" (
+    id SERIAL PRIMARY KEY,
+    no_hp VARCHAR(20),
+    log TEXT,
+    password VARCHAR(255),
+    role VARCHAR(10),
+    timestamp TIMESTAMP,
+    token TEXT,
+    suspended BOOLEAN DEFAULT FALSE
+);
+
+CREATE TABLE IF NOT EXISTS umkm (
+    id SERIAL PRIMARY KEY,
+    id_user INTEGER REFERENCES "user"(id) ON DELETE CASCADE,
+    nama VARCHAR(255),
+    kategori VARCHAR(255),
+    deskripsi TEXT,
+    alamat TEXT,
+    no_kontak VARCHAR(50),
+    npwp VARCHAR(50),
+    jam_buka VARCHAR(50),
+    foto_umkm VARCHAR(255),
+    dokumen VARCHAR(255),
+    status_umkm BOOLEAN DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS produk (
+    id SERIAL PRIMARY KEY,
+    id_umkm INTEGER REFERENCES umkm(id) ON DELETE CASCADE,
+    kode_produk VARCHAR(50),
+    nama_produk VARCHAR(255),
+    deskripsi TEXT,
+    harga NUMERIC,
+    masa_berlaku DATE,
+    foto_produk VARCHAR(255),
+    is_publik BOOLEAN DEFAULT FALSE
+);
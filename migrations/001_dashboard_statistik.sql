@@ -0,0 +1,33 @@
+-- Statistik dashboard (lihat app/services/dashboard_service.py): ringkasan per UMKM dijaga tetap terbaru
+-- oleh jalur tulis produk, total global dibaca dari materialized view yang di-refresh berkala.
+
+CREATE TABLE IF NOT EXISTS umkm_statistik (
+    id_umkm INTEGER PRIMARY KEY REFERENCES umkm(id) ON DELETE CASCADE,
+    produk_all INTEGER NOT NULL DEFAULT 0,
+    produk_publish INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Isi awal dari data yang sudah ada
+INSERT INTO umkm_statistik (id_umkm, produk_all, produk_publish)
+SELECT u.id, COUNT(p.id), COUNT(p.id) FILTER (WHERE p.is_publik)
+FROM umkm u
+LEFT JOIN produk p ON p.id_umkm = u.id
+GROUP BY u.id
+ON CONFLICT (id_umkm) DO NOTHING;
+
+-- Total global: satu baris (id selalu TRUE), dihitung ulang oleh REFRESH MATERIALIZED VIEW CONCURRENTLY.
+-- Penulis tidak pernah mengunci baris bersama, dan pembaca cukup membaca satu baris. refreshed_at adalah
+-- waktu refresh terakhir (batas kesegaran angka total).
+CREATE MATERIALIZED VIEW IF NOT EXISTS dashboard_statistik AS
+SELECT TRUE AS id,
+       COUNT(*)::INTEGER AS total_umkm,
+       (COUNT(*) FILTER (WHERE u.status_umkm))::INTEGER AS total_umkm_aktif,
+       COALESCE(SUM(s.produk_all), 0)::INTEGER AS total_produk,
+       COALESCE(SUM(s.produk_publish), 0)::INTEGER AS total_publish,
+       now()::TIMESTAMP AS refreshed_at
+FROM umkm u
+LEFT JOIN umkm_statistik s ON s.id_umkm = u.id;
+
+-- Wajib untuk REFRESH ... CONCURRENTLY (pembaca tidak ikut tertahan selama refresh)
+CREATE UNIQUE INDEX IF NOT EXISTS dashboard_statistik_id_idx ON dashboard_statistik (id);
@@ -0,0 +1,18 @@
+-- Kolom id "user", umkm dan produk diisi oleh sequence (identity), menggantikan pencarian id kosong
+-- (get_first_empty_id/get_missing_id) dan COALESCE(MAX(id), 0) + 1 yang bisa bentrok saat insert paralel.
+-- Sequence dimulai setelah id terbesar yang sudah ada.
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['user', 'umkm', 'produk'] LOOP
+        IF pg_get_serial_sequence(quote_ident(tbl), 'id') IS NULL THEN
+            EXECUTE format('ALTER TABLE %I ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY', tbl);
+        END IF;
+        EXECUTE format(
+            'SELECT setval(pg_get_serial_sequence(%L, ''id''), COALESCE((SELECT MAX(id) FROM %I), 0) + 1, false)',
+            quote_ident(tbl), tbl
+        );
+    END LOOP;
+END $$;
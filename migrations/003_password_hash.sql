@@ -0,0 +1,3 @@
+-- Password disimpan sebagai hash scrypt berversi (lihat app/utils/password_utils.py), lebih panjang dari
+-- plaintext. Password plaintext yang sudah ada di-hash dengan: python manage.py hash-passwords
+ALTER TABLE "user" ALTER COLUMN password TYPE TEXT;
@@ -0,0 +1,14 @@
+-- Riwayat login append-only, menggantikan penulisan ulang kolom log/timestamp di tabel "user" setiap login.
+-- Ditulis per batch oleh app/utils/audit.py. Tanpa foreign key agar riwayat tetap ada setelah user dihapus.
+CREATE TABLE IF NOT EXISTS login_audit (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    user_id INTEGER,
+    no_hp TEXT,
+    event VARCHAR(32) NOT NULL,
+    success BOOLEAN NOT NULL,
+    ip_address TEXT,
+    user_agent TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS login_audit_user_id_created_at_idx ON login_audit (user_id, created_at);
@@ -0,0 +1,15 @@
+-- Metadata file upload (foto_umkm, dokumen, foto_produk). Kolom file di tabel umkm/produk menyimpan key upload.
+-- File disimpan dulu dengan status 'pending'; checksum dan dedup diisi worker latar belakang (app/utils/uploads.py).
+CREATE TABLE IF NOT EXISTS upload (
+    key TEXT PRIMARY KEY,
+    kind VARCHAR(32) NOT NULL,
+    original_name TEXT,
+    content_type TEXT,
+    size BIGINT NOT NULL,
+    sha256 CHAR(64),
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    processed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS upload_sha256_idx ON upload (sha256) WHERE sha256 IS NOT NULL;
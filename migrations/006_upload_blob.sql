@@ -0,0 +1,16 @@
+-- Blob upload dialamatkan berdasarkan isi (UPLOAD_DIR/blobs/ab/cd/<sha256>). refcount = jumlah baris upload
+-- yang memakai blob; blob dengan refcount 0 dihapus oleh: python manage.py gc-uploads
+CREATE TABLE IF NOT EXISTS upload_blob (
+    sha256 CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    released_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS upload_blob_unreferenced_idx ON upload_blob (released_at) WHERE refcount <= 0;
+
+-- Upload dari layout lama (UPLOAD_DIR/files/<key>) yang sudah punya checksum
+INSERT INTO upload_blob (sha256, size, refcount)
+SELECT sha256, MAX(size), COUNT(*) FROM upload WHERE sha256 IS NOT NULL GROUP BY sha256
+ON CONFLICT (sha256) DO NOTHING;
@@ -0,0 +1,9 @@
+-- Index untuk GET /produk (produk_service.list_produks): keyset pagination per urutan (kolom urut, id),
+-- filter nama_produk ILIKE '%...%' (trigram), filter kategori UMKM, dan join produk -> umkm.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS produk_sort_nama_idx ON produk ((COALESCE(nama_produk, '')), id);
+CREATE INDEX IF NOT EXISTS produk_sort_harga_idx ON produk ((COALESCE(harga, 0)), id);
+CREATE INDEX IF NOT EXISTS produk_nama_produk_trgm_idx ON produk USING gin (nama_produk gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS produk_id_umkm_is_publik_idx ON produk (id_umkm, is_publik);
+CREATE INDEX IF NOT EXISTS umkm_kategori_lower_idx ON umkm (lower(kategori));
@@ -0,0 +1,19 @@
+-- Pencarian produk/UMKM (/search). tsvector memakai konfigurasi 'simple' (tanpa stemming, cocok untuk
+-- teks campuran Indonesia/Inggris) dengan bobot nama A, kategori/deskripsi B, alamat C.
+-- Index dibuat pada ekspresi, bukan kolom generated, agar SELECT * / RETURNING * yang dikirim ke client
+-- tidak ikut membawa kolom tsvector. Ekspresi harus sama persis dengan app/services/search_service.py.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS produk_search_idx ON produk USING gin ((
+    setweight(to_tsvector('simple', COALESCE(nama_produk, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(deskripsi, '')), 'B')
+));
+
+CREATE INDEX IF NOT EXISTS umkm_search_idx ON umkm USING gin ((
+    setweight(to_tsvector('simple', COALESCE(nama, '')), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(kategori, '')), 'B') ||
+    setweight(to_tsvector('simple', COALESCE(alamat, '')), 'C')
+));
+
+-- Trigram untuk nama yang salah ketik (produk.nama_produk sudah punya index trigram dari migrasi 007)
+CREATE INDEX IF NOT EXISTS umkm_nama_trgm_idx ON umkm USING gin (nama gin_trgm_ops);
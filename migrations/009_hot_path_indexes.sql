@@ -0,0 +1,13 @@
+-- Index untuk predikat yang dipakai di setiap request: login/registrasi (no_hp), UMKM per user,
+-- produk per UMKM, dan daftar UMKM nonaktif. Dicek dengan: python manage.py check-indexes
+-- no_hp unik: registrasi dengan nomor yang sudah terdaftar ditolak database. Hapus duplikat dulu jika gagal.
+CREATE UNIQUE INDEX IF NOT EXISTS user_no_hp_key ON "user" (no_hp);
+
+CREATE INDEX IF NOT EXISTS umkm_id_user_status_umkm_idx ON umkm (id_user, status_umkm);
+
+-- Sama dengan migrasi 007; tetap dicantumkan agar daftar index jalur utama lengkap di satu tempat
+CREATE INDEX IF NOT EXISTS produk_id_umkm_is_publik_idx ON produk (id_umkm, is_publik);
+
+-- UMKM nonaktif hanya sebagian kecil dari tabel: index parsial untuk /umkm/nonaktif (urut id) dan per user
+CREATE INDEX IF NOT EXISTS umkm_nonaktif_id_idx ON umkm (id) WHERE status_umkm = FALSE;
+CREATE INDEX IF NOT EXISTS umkm_nonaktif_id_user_idx ON umkm (id_user, id) WHERE status_umkm = FALSE;
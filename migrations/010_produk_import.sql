@@ -0,0 +1,3 @@
+-- Import produk massal (POST /produk/import) menggabungkan baris berdasarkan (id_umkm, kode_produk).
+-- Produk tanpa kode_produk (NULL) tidak ikut dibatasi. Jika gagal, hapus dulu kode_produk ganda per UMKM.
+CREATE UNIQUE INDEX IF NOT EXISTS produk_id_umkm_kode_produk_key ON produk (id_umkm, kode_produk);
@@ -0,0 +1,5 @@
+-- GET /uploads/<key> mencari UMKM/produk yang memakai file tersebut (cek pemilik dokumen dan
+-- file lama di folder uploads), jadi kolom file diindex
+CREATE INDEX IF NOT EXISTS umkm_dokumen_idx ON umkm (dokumen);
+CREATE INDEX IF NOT EXISTS umkm_foto_umkm_idx ON umkm (foto_umkm);
+CREATE INDEX IF NOT EXISTS produk_foto_produk_idx ON produk (foto_produk);